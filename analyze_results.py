@@ -1,7 +1,26 @@
 import os
 import json
-import pandas as pd
-from collections import defaultdict
+import mmap
+import pickle
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Errors that mean a result file is unreadable or malformed and should be skipped.
+# orjson.JSONDecodeError subclasses ValueError; anything else, including
+# KeyboardInterrupt, propagates.
+_SKIP_ERRORS = (OSError, ValueError, AttributeError, TypeError)
+if ijson is not None:
+    _SKIP_ERRORS += (ijson.JSONError,)
 
 # Define the root directories to analyze
 TARGET_DIRS = [
@@ -10,147 +29,311 @@ TARGET_DIRS = [
     r"d:\Downloads\aDrive\GOT\GOT\code\graph-of-thoughts\examples\eif_judge\results"
 ]
 
-def analyze_directory(base_dir):
-    results = []
+# Subdirectory names that hold the result files of a run
+_METHOD_DIRS = frozenset(("cot", "got", "tot", "io", "bfs", "dfs"))
+
+# Files larger than this are memory-mapped and handed to orjson without a copy
+MMAP_THRESHOLD = 32 * 1024
+
+def _load(path, size=None):
+    """Parse a JSON file, using orjson when it is installed. Pass size if it is already known."""
+    if size is None and orjson is not None:
+        size = os.path.getsize(path)
+    if orjson is not None and size > MMAP_THRESHOLD:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+    return _parse(_read_bytes(path))
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def _parse(raw):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# Aggregated records from previous runs, keyed by (experiment dir, latest mtime)
+CACHE_PATH = os.path.expanduser("~/.got_analysis_cache.pkl")
+
+# Version of the aggregation in _process_experiment; bump it whenever that changes,
+# so that records computed by the old code are not reused
+CACHE_VERSION = 2
+
+def _load_cache():
+    """Records of a cache written with the current CACHE_VERSION, or {} if there is none."""
+    try:
+        with open(CACHE_PATH, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError,
+            ValueError, TypeError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+    records = cache.get("records")
+    return records if isinstance(records, dict) else {}
+
+def _save_cache(cache):
+    with open(CACHE_PATH, 'wb') as f:
+        pickle.dump({"version": CACHE_VERSION, "records": cache}, f)
+
+# Result files at least this large are streamed with ijson rather than parsed in one go
+STREAM_THRESHOLD = 64 * 1024
+
+# Number of small result files read ahead on threads while the current one is parsed
+READ_AHEAD = 4
+
+def _read_mode(size):
+    """How a result file of the given size is parsed: "stream", "mmap" or "read"."""
+    if ijson is not None and size >= STREAM_THRESHOLD:
+        return "stream"
+    if orjson is not None and size > MMAP_THRESHOLD:
+        return "mmap"
+    return "read"
+
+def _read_ahead(files):
+    """
+    Yield (path, size, future) for each (path, size) in order while up to
+    READ_AHEAD plain reads run on threads.
+
+    The future holds the file's bytes, or is None for files that _iter_items
+    maps or streams itself.
+    """
+    with ThreadPoolExecutor(READ_AHEAD) as tp:
+        pending = deque()
+        for path, size in files:
+            fut = tp.submit(_read_bytes, path) if _read_mode(size) == "read" else None
+            pending.append((path, size, fut))
+            if len(pending) > READ_AHEAD:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+def _iter_items(path, size, prefetched=None):
+    """Yield the top-level items of a result file, streaming large files when ijson is installed."""
+    if prefetched is not None:
+        yield from _parse(prefetched.result())
+    elif _read_mode(size) == "stream":
+        with open(path, 'rb') as f:
+            yield from ijson.items(f, 'item', use_float=True)
+    else:
+        yield from _load(path, size)
+
+def _find_experiments(path):
+    """Yield (root, subdirs) for every directory under path holding a config.json."""
+    subdirs = []
+    has_config = False
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            elif entry.name == "config.json":
+                has_config = True
+    if has_config:
+        yield path, subdirs
+    for name in subdirs:
+        yield from _find_experiments(f"{path}{os.sep}{name}")
+
+def _experiment_mtime(root, dirs):
+    """Latest mtime (ns) of an experiment's config, its subdirectories and their files."""
+    # Names come straight from scandir, so plain concatenation is enough here
+    latest = os.stat(f"{root}{os.sep}config.json").st_mtime_ns
+    for d in dirs:
+        subdir = f"{root}{os.sep}{d}"
+        # The directory's own mtime changes when a result file is removed
+        latest = max(latest, os.stat(subdir).st_mtime_ns)
+        with os.scandir(subdir) as it:
+            for entry in it:
+                latest = max(latest, entry.stat().st_mtime_ns)
+    return latest
+
+def _process_experiment(job):
+    """Aggregate the result files of one experiment folder, or return None if it has none."""
+    task_name, root, dirs = job
+    # This is an experiment directory
+    config_path = os.path.join(root, "config.json")
+    try:
+        config = _load(config_path)
+    except Exception as e:
+        print(f"Error reading config at {config_path}: {e}")
+        return None
+
+    # Extract metadata
+    model = config.get("lm", "unknown")
+    methods = config.get("methods", ["unknown"])
+    method = methods[0] if isinstance(methods, list) and methods else "unknown"
     
-    # Walk through the directory to find experiment folders
-    for root, dirs, files in os.walk(base_dir):
-        if "config.json" in files:
-            # This is an experiment directory
-            config_path = os.path.join(root, "config.json")
-            try:
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-            except Exception as e:
-                print(f"Error reading config at {config_path}: {e}")
-                continue
-
-            # Extract metadata
-            model = config.get("lm", "unknown")
-            methods = config.get("methods", ["unknown"])
-            method = methods[0] if isinstance(methods, list) and methods else "unknown"
-            
-            # The result files are usually in a subdirectory named after the method
-            # But sometimes the method name in config doesn't match the folder name exactly
-            # Let's look for a subdirectory that is NOT the current one, or just check known method names
-            # Based on `ls` output, there is a subdirectory like `cot`, `got`, `io`, `tot`
-            
-            result_subdir = None
-            for d in dirs:
-                if d in ["cot", "got", "tot", "io", "bfs", "dfs"]:
-                    result_subdir = os.path.join(root, d)
-                    break
-            
-            if not result_subdir:
-                # Fallback: check if there are json files in the current dir (unlikely based on ls)
-                # Or maybe the method name is different.
-                # Let's try to use the method name from config
-                candidate = os.path.join(root, method)
-                if os.path.exists(candidate):
-                    result_subdir = candidate
-                else:
-                    # print(f"Could not find result subdir for {root}, method {method}")
-                    continue
-
-            # Process result files
-            metrics = {
-                "total_cost": 0.0,
-                "total_prompt_tokens": 0,
-                "total_completion_tokens": 0,
-                "f1_scores": [],
-                "precisions": [],
-                "recalls": [],
-                "exact_matches": [],
-                "problem_solved_count": 0,
-                "total_files": 0
-            }
-
-            for res_file in os.listdir(result_subdir):
-                if not res_file.endswith(".json"):
-                    continue
-                
-                res_path = os.path.join(result_subdir, res_file)
-                try:
-                    with open(res_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                except:
-                    continue
-                
-                metrics["total_files"] += 1
-                
-                # Extract metrics from the list of operations
-                file_cost = 0
-                file_f1 = 0
-                file_precision = 0
-                file_recall = 0
-                file_solved = False
+    # The result files are usually in a subdirectory named after the method
+    # But sometimes the method name in config doesn't match the folder name exactly
+    # Let's look for a subdirectory that is NOT the current one, or just check known method names
+    # Based on `ls` output, there is a subdirectory like `cot`, `got`, `io`, `tot`
+    
+    hit = next((d for d in dirs if d in _METHOD_DIRS), None)
+    result_subdir = f"{root}{os.sep}{hit}" if hit else None
+    
+    if not result_subdir:
+        # Fallback: check if there are json files in the current dir (unlikely based on ls)
+        # Or maybe the method name is different.
+        # Let's try to use the method name from config
+        if method in dirs:
+            result_subdir = f"{root}{os.sep}{method}"
+        else:
+            # print(f"Could not find result subdir for {root}, method {method}")
+            return None
+
+    # Process result files
+    # The size from the directory scan picks the read, mmap or stream path without another stat
+    with os.scandir(result_subdir) as it:
+        res_files = [(e.path, e.stat(follow_symlinks=False).st_size)
+                     for e in it if e.name.endswith(".json")]
+
+    # Running sums; metric_count is the number of evaluation_metrics items over all files
+    f1_sum = 0.0
+    precision_sum = 0.0
+    recall_sum = 0.0
+    metric_count = 0
+    solved_count = 0
+    total_cost = 0.0
+    total_prompt_tokens = 0
+    total_completion_tokens = 0
+    num_files = 0
+
+    for res_path, size, prefetched in _read_ahead(res_files):
+        # Extract metrics from the list of operations
+        file_cost = 0
+        file_prompt_tokens = 0
+        file_completion_tokens = 0
+        # Per-file sums of f1, precision and recall, and the number of items they cover
+        file_scores = [0.0, 0.0, 0.0]
+        file_metric_count = 0
+        file_solved = False
+
+        # Items are only committed once the whole file has parsed, so a
+        # truncated stream is skipped just like an unreadable file
+        try:
+            for item in _iter_items(res_path, size, prefetched):
+                # Cost is usually in an item with "cost" key
+                cost = item.get("cost")
+                if cost is not None:
+                    file_cost += cost
+                    file_prompt_tokens += item.get("prompt_tokens", 0)
+                    file_completion_tokens += item.get("completion_tokens", 0)
                 
-                for item in data:
-                    # Cost is usually in an item with "cost" key
-                    if "cost" in item:
-                        file_cost = item.get("cost", 0)
-                        metrics["total_cost"] += file_cost
-                        metrics["total_prompt_tokens"] += item.get("prompt_tokens", 0)
-                        metrics["total_completion_tokens"] += item.get("completion_tokens", 0)
-                    
-                    # Evaluation metrics
-                    if "evaluation_metrics" in item:
-                        eval_m = item["evaluation_metrics"]
-                        file_f1 = eval_m.get("f1_score", 0)
-                        file_precision = eval_m.get("precision", 0)
-                        file_recall = eval_m.get("recall", 0)
-                        metrics["f1_scores"].append(file_f1)
-                        metrics["precisions"].append(file_precision)
-                        metrics["recalls"].append(file_recall)
-                        metrics["exact_matches"].append(eval_m.get("exact_matches", 0))
-
-                    # Problem solved
-                    if "problem_solved" in item:
-                        # It might be a list [true] or boolean
-                        ps = item["problem_solved"]
-                        if isinstance(ps, list) and len(ps) > 0:
-                            if ps[0]:
-                                file_solved = True
-                        elif isinstance(ps, bool) and ps:
+                # Evaluation metrics
+                eval_m = item.get("evaluation_metrics")
+                if eval_m is not None:
+                    file_scores[0] += eval_m.get("f1_score", 0)
+                    file_scores[1] += eval_m.get("precision", 0)
+                    file_scores[2] += eval_m.get("recall", 0)
+                    file_metric_count += 1
+
+                # Problem solved
+                ps = item.get("problem_solved")
+                if ps is not None:
+                    # It might be a list [true] or boolean
+                    if isinstance(ps, list) and len(ps) > 0:
+                        if ps[0]:
                             file_solved = True
-                
-                if file_solved:
-                    metrics["problem_solved_count"] += 1
-
-            # Aggregate for this experiment
-            num_files = metrics["total_files"]
-            if num_files > 0:
-                avg_f1 = sum(metrics["f1_scores"]) / len(metrics["f1_scores"]) if metrics["f1_scores"] else 0
-                avg_precision = sum(metrics["precisions"]) / len(metrics["precisions"]) if metrics["precisions"] else 0
-                avg_recall = sum(metrics["recalls"]) / len(metrics["recalls"]) if metrics["recalls"] else 0
-                success_rate = metrics["problem_solved_count"] / num_files
-                avg_cost = metrics["total_cost"] / num_files
-                
-                results.append({
-                    "Task": os.path.basename(os.path.dirname(base_dir)), # e.g. ilf_selection
-                    "Model": model,
-                    "Method": method,
-                    "Files": num_files,
-                    "Avg_F1": avg_f1,
-                    "Avg_Precision": avg_precision,
-                    "Avg_Recall": avg_recall,
-                    "Success_Rate": success_rate,
-                    "Avg_Cost": avg_cost,
-                    "Total_Cost": metrics["total_cost"]
-                })
+                    elif isinstance(ps, bool) and ps:
+                        file_solved = True
+        except _SKIP_ERRORS:
+            continue
+        
+        num_files += 1
+        total_cost += file_cost
+        total_prompt_tokens += file_prompt_tokens
+        total_completion_tokens += file_completion_tokens
+        f1_sum += file_scores[0]
+        precision_sum += file_scores[1]
+        recall_sum += file_scores[2]
+        metric_count += file_metric_count
+        if file_solved:
+            solved_count += 1
+
+    # Aggregate for this experiment
+    if num_files > 0:
+        avg_f1 = f1_sum / metric_count if metric_count else 0
+        avg_precision = precision_sum / metric_count if metric_count else 0
+        avg_recall = recall_sum / metric_count if metric_count else 0
+        success_rate = solved_count / num_files
+        avg_cost = total_cost / num_files
+        
+        return {
+            "Task": task_name,
+            "Model": model,
+            "Method": method,
+            "Files": num_files,
+            "Avg_F1": avg_f1,
+            "Avg_Precision": avg_precision,
+            "Avg_Recall": avg_recall,
+            "Success_Rate": success_rate,
+            "Avg_Cost": avg_cost,
+            "Total_Cost": total_cost
+        }
+    return None
+
+def analyze_directories(base_dirs, cache=None, fresh_cache=None):
+    """
+    Aggregate every experiment under the given base directories.
+
+    All experiments share one process pool, so a small tree does not leave
+    cores idle while a larger one is still running. Experiments whose (dir, mtime) key is in cache are reused, the rest are
+    recomputed. Every record used is written to fresh_cache when it is given.
+    """
+    if cache is None:
+        cache = {}
+    results = []
+    
+    # Walk through the directory to find experiment folders
+    keys = []
+    records = []
+    jobs = []
+    for base_dir in base_dirs:
+        task_name = os.path.basename(os.path.dirname(base_dir)) # e.g. ilf_selection
+        for root, dirs in _find_experiments(base_dir):
+            key = (root, _experiment_mtime(root, dirs))
+            keys.append(key)
+            if key in cache:
+                records.append(cache[key])
+            else:
+                records.append(None)
+                jobs.append((len(records) - 1, (task_name, root, dirs)))
+
+    # Each experiment is independent, so decode and aggregate them in parallel
+    if jobs:
+        with ProcessPoolExecutor() as ex:
+            computed = ex.map(_process_experiment, [job for _, job in jobs], chunksize=16)
+            for (idx, _), r in zip(jobs, computed):
+                records[idx] = r
+
+    for key, r in zip(keys, records):
+        if fresh_cache is not None:
+            fresh_cache[key] = r
+        if r:
+            results.append(r)
 
     return results
 
-all_results = []
-for d in TARGET_DIRS:
-    if os.path.exists(d):
-        all_results.extend(analyze_directory(d))
+def analyze_directory(base_dir, cache=None, fresh_cache=None):
+    """Aggregate every experiment under a single base directory."""
+    return analyze_directories([base_dir], cache, fresh_cache)
+
+if __name__ == "__main__":
+    cache = _load_cache()
+    fresh_cache = {}
+    all_results = analyze_directories([d for d in TARGET_DIRS if os.path.exists(d)], cache, fresh_cache)
+    _save_cache(fresh_cache)
 
-df = pd.DataFrame(all_results)
-# Sort for better readability
-df = df.sort_values(by=["Task", "Model", "Method"])
+    # Sort for better readability
+    all_results.sort(key=lambda r: (r["Task"], r["Model"], r["Method"]))
 
-# Save to CSV
-output_path = r"d:\Downloads\aDrive\GOT\GOT\code\graph-of-thoughts\analysis_results.csv"
-df.to_csv(output_path, index=False, encoding='utf-8')
-print(f"Results saved to {output_path}")
+    # Save to CSV
+    output_path = r"d:\Downloads\aDrive\GOT\GOT\code\graph-of-thoughts\analysis_results.csv"
+    # Every field is an identifier or a number, so rows are formatted and written as bytes directly
+    with open(output_path, 'wb') as f:
+        f.write(b"Task,Model,Method,Files,Avg_F1,Avg_Precision,Avg_Recall,Success_Rate,Avg_Cost,Total_Cost\n")
+        for r in all_results:
+            f.write(f"{r['Task']},{r['Model']},{r['Method']},{r['Files']},{r['Avg_F1']},{r['Avg_Precision']},"
+                    f"{r['Avg_Recall']},{r['Success_Rate']},{r['Avg_Cost']},{r['Total_Cost']}\n".encode('utf-8'))
+    print(f"Results saved to {output_path}")
@@ -3,12 +3,26 @@ import json
 import csv
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _load(path):
+    """Parse a JSON file, using orjson when it is installed."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 def aggregate_results(results_dir, labels, task_name=""):
     if not os.path.exists(results_dir):
         print(f"Results directory not found: {results_dir}")
         return
 
     print(f"\n--- Aggregating {task_name} Results ---")
+    rows = []
     # Iterate through each experiment folder
     for folder in sorted(os.listdir(results_dir)):
         folder_path = os.path.join(results_dir, folder)
@@ -28,43 +42,54 @@ def aggregate_results(results_dir, labels, task_name=""):
         tp, tn, fp, fn = 0, 0, 0, 0
         total_cost = 0.0
         
+        # List the subdirectory once instead of probing each sample file
+        with os.scandir(subdir) as it:
+            present = {e.name: e.path for e in it if e.is_file() and e.name.endswith('.json')}
+
         # Process each of the 10 samples
         for i in range(1, 11):
-            file_path = os.path.join(subdir, f"{i}.json")
-            if os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    solved = False
-                    cost = 0.0
-                    
-                    # Extract problem_solved and cost from the JSON structure
-                    for item in data:
-                        if isinstance(item, dict):
-                            if "problem_solved" in item:
-                                solved = item["problem_solved"][0]
-                            if "cost" in item:
-                                cost = item["cost"]
-                    
-                    total_cost += cost
-                    gt = labels.get(i)
-                    
-                    if solved:
-                        if gt is True:
-                            tp += 1
-                        else:
-                            tn += 1
+            file_path = present.get(f"{i}.json")
+            if file_path is None:
+                continue
+            try:
+                data = _load(file_path)
+                
+                solved = False
+                cost = 0.0
+                
+                # Extract problem_solved and cost from the JSON structure
+                for item in data:
+                    if isinstance(item, dict):
+                        ps = item.get("problem_solved")
+                        if ps is not None:
+                            solved = ps[0]
+                        c = item.get("cost")
+                        if c is not None:
+                            cost = c
+                
+                total_cost += cost
+                gt = labels.get(i)
+                
+                if solved:
+                    if gt is True:
+                        tp += 1
                     else:
-                        if gt is True:
-                            fn += 1
-                        else:
-                            fp += 1
-                            
-                except Exception as e:
-                    print(f"Error parsing {file_path}: {e}")
+                        tn += 1
+                else:
+                    if gt is True:
+                        fn += 1
+                    else:
+                        fp += 1
+                        
+            # Only malformed or unreadable files are reported; interrupts propagate
+            except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+                print(f"Error parsing {file_path}: {e}")
         
-        print(f"{folder} | TP:{tp} TN:{tn} FP:{fp} FN:{fn} | Cost:{total_cost:.7f}")
+        rows.append(f"{folder} | TP:{tp} TN:{tn} FP:{fp} FN:{fn} | Cost:{total_cost:.7f}")
+
+    # Write the summary in one go rather than one flush per folder
+    if rows:
+        sys.stdout.write("\n".join(rows) + "\n")
 
 if __name__ == "__main__":
     # EIF labels
@@ -8,12 +8,19 @@
 
 import os
 import logging
+import logging.handlers
+import queue
 import datetime
 import json
 import csv
 import re
+import hashlib
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial, total_ordering
 from typing import Dict, List, Callable, Union
+import graph_of_thoughts
 from graph_of_thoughts import controller, language_models, operations, prompter, parser
 
 def test_eif_assessment(state: Dict) -> bool:
@@ -60,6 +67,57 @@ def score_assessment(state: Dict) -> float:
     except:
         return 0.0
 
+def majority_vote(thoughts: List[operations.Thought]) -> List[operations.Thought]:
+    """
+    Function to select the answer given by the majority of the sampled thoughts
+    (self-consistency). Ties are resolved as "否", matching the parser's default.
+
+    :param thoughts: Sampled thoughts, each with a boolean final_answer.
+    :type thoughts: List[Thought]
+    :return: A single thought carrying the majority answer and the vote counts.
+    :rtype: List[Thought]
+    """
+    if len(thoughts) == 0:
+        return []
+    yes_votes = sum(1 for thought in thoughts if thought.state.get("final_answer"))
+    majority = yes_votes * 2 > len(thoughts)
+    for thought in thoughts:
+        if bool(thought.state.get("final_answer")) == majority:
+            return [operations.Thought({**thought.state, "votes": {"是": yes_votes, "否": len(thoughts) - yes_votes}})]
+
+# IFPUG 规则中明确不计为逻辑文件的数据（帮助信息、事务/临时/工作/排序文件、备份），
+# 名称中含有这些关键词的候选可以直接判为"否"，无需调用语言模型
+TRIAGE_NEGATIVE_KEYWORDS = ("帮助", "事务文件", "临时", "工作文件", "排序文件", "备份")
+
+def triage(candidate_name: str) -> Union[bool, None]:
+    """
+    Function to decide the obvious candidates from their name alone.
+
+    :param candidate_name: Name of the candidate function point.
+    :type candidate_name: str
+    :return: False if the name marks data that is never a logical file, None if the
+             language model has to decide.
+    :rtype: Union[bool, None]
+    """
+    for keyword in TRIAGE_NEGATIVE_KEYWORDS:
+        if keyword in candidate_name:
+            return False
+    return None
+
+def triage_answer(thoughts: List[operations.Thought]) -> List[operations.Thought]:
+    """
+    Function to turn the initial state into a final answer given by triage.
+
+    :param thoughts: Thoughts carrying the initial state.
+    :type thoughts: List[Thought]
+    :return: The thoughts with final_answer set by triage.
+    :rtype: List[Thought]
+    """
+    return [
+        operations.Thought({**thought.state, "final_answer": False, "current": "否", "phase": "triage"})
+        for thought in thoughts
+    ]
+
 class FunctionPointPrompter(prompter.Prompter):
     """
     FunctionPointPrompter provides the generation of prompts specific to the
@@ -68,16 +126,32 @@ class FunctionPointPrompter(prompter.Prompter):
     Inherits from the Prompter class and implements its abstract methods.
     """
 
-    io_prompt = """你是一个IFPUG功能点分析专家。请判断给定的功能点是否构成外部接口文件（EIF）。
-只需回答"是"或"否"。
+    # 所有提示词共用同一个前缀（角色 + 需求文档），候选功能点等易变内容放在末尾，
+    # 以便同一文档的多次请求能命中服务端的前缀缓存（prompt caching）。
+    context_prompt = """你是一个IFPUG功能点分析专家。
 
 [需求文档]
 {requirement_text}
 
+"""
+
+    io_prompt = context_prompt + """请判断给定的功能点是否构成外部接口文件（EIF）。
+只需回答"是"或"否"。
+
 [候选功能点]
 名称：{candidate_name}"""
 
-    cot_prompt = """你是一个IFPUG功能点分析专家。请判断给定的功能点是否构成外部接口文件（EIF）。
+    # 同一需求文档的所有候选功能点放在一次请求中判断；提示词不含单个候选名称，
+    # 因此同一文档的各个样本得到完全相同的提示词，可共用一次回答。
+    batch_io_prompt = context_prompt + """请分别判断以下每个候选功能点是否构成外部接口文件（EIF）。
+每个候选单独一行作答，格式为"候选序号：是"或"候选序号：否"，不要输出其他内容。例如：
+候选1：是
+候选2：否
+
+[候选功能点]
+{candidates}"""
+
+    cot_prompt = context_prompt + """请判断给定的功能点是否构成外部接口文件（EIF）。
 请按照以下步骤进行分析：
 
 1. 首先，判断是否逻辑上独立且用户可识别
@@ -85,12 +159,6 @@ class FunctionPointPrompter(prompter.Prompter):
 3. 最后，判断是否不由当前应用进行维护（即只读，不增删改）
 4. 根据以上分析，得出最终结论
 
-[需求文档]
-{requirement_text}
-
-[候选功能点]
-名称：{candidate_name}
-
 请按以下格式输出：
 思考过程：
 1. [分析第一个条件]
@@ -98,15 +166,12 @@ class FunctionPointPrompter(prompter.Prompter):
 3. [分析第三个条件]
 4. [得出结论]
 
-最终答案：[是/否]"""
-
-    tot_prompt = """你是一个IFPUG功能点分析专家。请判断给定的功能点是否构成外部接口文件（EIF）。
-
-[需求文档]
-{requirement_text}
+最终答案：[是/否]
 
 [候选功能点]
-名称：{candidate_name}
+名称：{candidate_name}"""
+
+    tot_prompt = context_prompt + """请判断给定的功能点是否构成外部接口文件（EIF）。
 
 请按以下方法分析候选功能点是否为EIF功能点：
 
@@ -127,15 +192,12 @@ class FunctionPointPrompter(prompter.Prompter):
    3.2 [验证是否有遗漏]
 
 4. 最终结论
-   [是/否]"""
-
-    got_prompt = """你是一个IFPUG功能点分析专家。请判断给定的功能点是否构成外部接口文件（EIF）。
-
-[需求文档]
-{requirement_text}
+   [是/否]
 
 [候选功能点]
-名称：{candidate_name}
+名称：{candidate_name}"""
+
+    got_prompt = context_prompt + """请判断给定的功能点是否构成外部接口文件（EIF）。
 
 请按以下步骤分析：
 
@@ -162,34 +224,27 @@ class FunctionPointPrompter(prompter.Prompter):
 - 处理可能的冲突
 - 得出最终判断
 
-最终答案：[是/否]"""
-
-    tot_improve_prompt = """你是一个IFPUG功能点分析专家。基于之前的分析结果进行改进：
-
-之前的判断：{current}
-
-[需求文档]
-{requirement_text}
+最终答案：[是/否]
 
 [候选功能点]
-名称：{candidate_name}
+名称：{candidate_name}"""
 
-请基于之前的判断进行改进：
+    tot_improve_prompt = context_prompt + """请判断给定的功能点是否构成外部接口文件（EIF）。基于之前的分析结果进行改进：
 1. 分析之前判断的优点
 2. 找出可能的问题或遗漏
 3. 重新检查EIF的三个关键条件
 4. 给出改进后的判断
 
-最终答案：[是/否]"""
-
-    perspective_prompt = """你是一个IFPUG功能点分析专家。请从{perspective}分析此功能点是否构成EIF。
-
-[需求文档]
-{requirement_text}
+最终答案：[是/否]
 
 [候选功能点]
 名称：{candidate_name}
 
+[之前的判断]
+{current}"""
+
+    perspective_prompt = context_prompt + """请从指定的分析视角分析此功能点是否构成EIF。
+
 [分析视角说明]
 用户视角 - 关注：
 - 数据组是否逻辑上独立且用户可识别
@@ -229,25 +284,15 @@ IFPUG规则视角 - 关注：
 5. 结论：
    [总结性分析]
 
-该视角的判断：[是/否]"""
-
-    merge_prompt = """你是一个IFPUG功能点分析专家。请综合以下三个视角的分析结果，判断此功能点是否构成EIF。
-
-[需求文档]
-{requirement_text}
+该视角的判断：[是/否]
 
 [候选功能点]
 名称：{candidate_name}
 
-[各视角分析结果]
-用户视角分析：
-{user_perspective}
+[分析视角]
+{perspective}"""
 
-系统视角分析：
-{system_perspective}
-
-IFPUG规则视角分析：
-{ifpug_perspective}
+    merge_prompt = context_prompt + """请综合三个视角的分析结果，判断此功能点是否构成EIF。
 
 [分析要求]
 1. 必须同时满足以下所有条件才能判定为EIF：
@@ -285,7 +330,20 @@ IFPUG规则视角分析：
 4. 综合分析：
    [详细的权衡分析]
 
-最终判断：[是/否]"""
+最终判断：[是/否]
+
+[候选功能点]
+名称：{candidate_name}
+
+[各视角分析结果]
+用户视角分析：
+{user_perspective}
+
+系统视角分析：
+{system_perspective}
+
+IFPUG规则视角分析：
+{ifpug_perspective}"""
 
     def generate_prompt(self, num_branches: int, current: str, method: str, **kwargs) -> str:
         """
@@ -304,11 +362,19 @@ IFPUG规则视角分析：
         """
         assert num_branches == 1, "Branching should be done via multiple requests."
         
-        # 添加调试日志
-        logging.debug(f"Method: {method}")
-        logging.debug(f"Current state: {kwargs}")
+        # 添加调试日志（%s 延迟格式化：状态中包含完整需求文档，仅在 DEBUG 级别下才会转成字符串）
+        logging.debug("Method: %s", method)
+        logging.debug("Current state: %s", kwargs)
         
-        if method.startswith("io"):
+        if method.startswith("io_batch"):
+            candidates = "\n".join(
+                f"候选{i}：{name}" for i, name in enumerate(kwargs["candidates"], 1)
+            )
+            return self.batch_io_prompt.format(
+                requirement_text=kwargs["requirement_text"],
+                candidates=candidates
+            )
+        elif method.startswith("io"):
             return self.io_prompt.format(
                 requirement_text=kwargs["requirement_text"],
                 candidate_name=kwargs["candidate_name"]
@@ -332,21 +398,12 @@ IFPUG规则视角分析：
         elif method.startswith("got"):
             # 检查状态中的phase和perspective
             if "phase" in kwargs and kwargs["phase"] == "analysis" and "perspective" in kwargs:
-                logging.debug(f"Using perspective prompt for {kwargs['perspective']}")
+                logging.debug("Using perspective prompt for %s", kwargs['perspective'])
                 return self.perspective_prompt.format(
                     perspective=kwargs["perspective"],
                     requirement_text=kwargs["requirement_text"],
                     candidate_name=kwargs["candidate_name"]
                 )
-            elif "phase" in kwargs and kwargs["phase"] == "merge" and kwargs.get("merge_perspectives"):
-                logging.debug("Using merge prompt")
-                return self.merge_prompt.format(
-                    requirement_text=kwargs["requirement_text"],
-                    candidate_name=kwargs["candidate_name"],
-                    user_perspective=kwargs.get("user_perspective", ""),
-                    system_perspective=kwargs.get("system_perspective", ""),
-                    ifpug_perspective=kwargs.get("ifpug_perspective", "")
-                )
             else:
                 logging.debug("Using default got prompt")
                 return self.got_prompt.format(
@@ -357,6 +414,7 @@ IFPUG规则视角分析：
     def aggregation_prompt(self, state_dicts: List[Dict], **kwargs) -> str:
         """
         Generate an aggregation prompt for the language model.
+        合并三个视角的分析结果（GoT的合并阶段）。
 
         :param state_dicts: The thought states that should be aggregated.
         :type state_dicts: List[Dict]
@@ -364,7 +422,19 @@ IFPUG规则视角分析：
         :return: The aggregation prompt.
         :rtype: str
         """
-        pass
+        logging.debug("Using merge prompt")
+        perspectives = {}
+        for state in state_dicts:
+            for key in ("user_perspective", "system_perspective", "ifpug_perspective"):
+                if key in state:
+                    perspectives[key] = state[key]
+        return self.merge_prompt.format(
+            requirement_text=state_dicts[0]["requirement_text"],
+            candidate_name=state_dicts[0]["candidate_name"],
+            user_perspective=perspectives.get("user_perspective", ""),
+            system_perspective=perspectives.get("system_perspective", ""),
+            ifpug_perspective=perspectives.get("ifpug_perspective", "")
+        )
 
     def improve_prompt(self, current: str, aggr1: str, aggr2: str, **kwargs) -> str:
         """
@@ -413,6 +483,24 @@ class FunctionPointParser(parser.Parser):
     Inherits from the Parser class and implements its abstract methods.
     """
 
+    # 不同的答案格式，按优先级排列；第一个捕获组即为"是"或"否"。
+    # 优先级依赖于顺序，因此不能合并为一个正则（交替只会选最靠前的位置）。
+    answer_patterns = tuple(re.compile(pattern) for pattern in (
+        r'最终判断：\[(是)/否\]',  # 标准格式
+        r'最终判断：.*?(是|否)',  # 带任意字符的格式
+        r'该视角的判断：\[(是)/否\]',  # 视角分析格式
+        r'该视角的判断：.*?(是|否)',  # 带任意字符的视角分析格式
+        r'最终答案：\[(是)/否\]',  # 另一种标准格式
+        r'最终答案：.*?(是|否)',  # 带任意字符的另一种格式
+        r'判断：.*?(是|否)',  # 简单格式
+        r'结论：.*?(是|否)',  # 结论格式
+        r'\*\*(是|否)\*\*',  # Markdown加粗格式
+        r'最终判断：\*\*(是|否)\*\*',  # 带加粗的最终判断格式
+        r'(是|否)'  # 最简单的格式（最后尝试）
+    ))
+    # 批量回答中每个候选的答案："候选序号：是/否"
+    batch_answer_pattern = re.compile(r'候选\s*(\d+)\s*[：:]\s*\**\s*(是|否)')
+
     def extract_answer(self, text: str) -> str:
         """
         从文本中提取答案（是/否）。
@@ -422,36 +510,40 @@ class FunctionPointParser(parser.Parser):
         :return: 提取出的答案（是/否）
         :rtype: str
         """
-        # 尝试不同的答案格式
-        patterns = [
-            r'最终判断：\[是/否\]',  # 标准格式
-            r'最终判断：.*?(?:是|否)',  # 带任意字符的格式
-            r'该视角的判断：\[是/否\]',  # 视角分析格式
-            r'该视角的判断：.*?(?:是|否)',  # 带任意字符的视角分析格式
-            r'最终答案：\[是/否\]',  # 另一种标准格式
-            r'最终答案：.*?(?:是|否)',  # 带任意字符的另一种格式
-            r'判断：.*?(?:是|否)',  # 简单格式
-            r'结论：.*?(?:是|否)',  # 结论格式
-            r'\*\*(?:是|否)\*\*',  # Markdown加粗格式
-            r'最终判断：\*\*(?:是|否)\*\*',  # 带加粗的最终判断格式
-            r'(?:是|否)'  # 最简单的格式（最后尝试）
-        ]
-        
         # 去除所有换行符，便于匹配
         text = text.replace('\n', ' ')
         
-        for pattern in patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                # 提取匹配文本中的"是"或"否"
-                answer = re.search(r'(?:是|否)', match.group())
-                if answer:
-                    return answer.group()
+        for pattern in self.answer_patterns:
+            match = pattern.search(text)
+            if match:
+                return match.group(1)
         
         # 如果没有找到任何匹配，返回默认值
         logging.warning(f"No answer found in text: {text}")
         return "否"  # 默认返回否
 
+    def parse_batch_answer(self, text: str, n: int) -> List[bool]:
+        """
+        从批量回答中提取每个候选的答案（候选序号：是/否）。
+
+        :param text: 包含答案的文本
+        :type text: str
+        :param n: 候选功能点的数量
+        :type n: int
+        :return: 每个候选的判断结果，未找到的候选默认为否
+        :rtype: List[bool]
+        """
+        answers = [False] * n
+        found = set()
+        for match in self.batch_answer_pattern.finditer(text):
+            index = int(match.group(1)) - 1
+            if 0 <= index < n and index not in found:
+                answers[index] = match.group(2) == "是"
+                found.add(index)
+        if len(found) < n:
+            logging.warning(f"Only {len(found)} of {n} candidates answered in text: {text}")
+        return answers
+
     def parse_generate_answer(self, state: Dict, texts: List[str]) -> List[Dict]:
         """
         Parse the response from the language model for a generate prompt.
@@ -461,19 +553,25 @@ class FunctionPointParser(parser.Parser):
         :param texts: The responses to the prompt from the language model.
         :type texts: List[str]
         :return: The new thought states after parsing the responses from the language model.
+                 Only the keys that change are returned; Generate merges them into the base state.
         :rtype: List[Dict]
         """
         new_states = []
         for text in texts:
             try:
-                new_state = state.copy()
+                new_state = {}
                 
                 # 保存原始回答
                 new_state["current"] = text
                 
                 # 提取答案并转换为布尔类型
-                answer = self.extract_answer(text)
-                new_state["final_answer"] = (answer == "是")
+                if "candidates" in state:
+                    # 批量判断：取出当前候选对应的那一行
+                    answers = self.parse_batch_answer(text, len(state["candidates"]))
+                    new_state["final_answer"] = answers[state["candidates"].index(state["candidate_name"])]
+                else:
+                    answer = self.extract_answer(text)
+                    new_state["final_answer"] = (answer == "是")
                 
                 # 根据不同阶段存储分析结果
                 if "perspective" in state:
@@ -487,15 +585,12 @@ class FunctionPointParser(parser.Parser):
                         new_state["system_perspective"] = text
                     elif perspective == "IFPUG规则视角":
                         new_state["ifpug_perspective"] = text
-                elif "merge_perspectives" in state:
-                    # 合并阶段
-                    new_state["merged_analysis"] = text
                 
                 new_states.append(new_state)
             except Exception as e:
                 logging.error(f"Could not parse answer: {text}. Error: {e}")
                 # 发生错误时添加一个默认状态
-                default_state = state.copy()
+                default_state = {}
                 default_state["current"] = text
                 default_state["final_answer"] = False  # 默认为否
                 default_state["parse_error"] = str(e)
@@ -513,7 +608,16 @@ class FunctionPointParser(parser.Parser):
         :return: The new thought states after parsing the respones from the language model.
         :rtype: Union[Dict, List[Dict]]
         """
-        pass
+        new_states = []
+        for text in texts:
+            answer = self.extract_answer(text)
+            new_states.append({
+                "current": text,
+                "final_answer": (answer == "是"),
+                "phase": "merge",
+                "merged_analysis": text,
+            })
+        return new_states
 
     def parse_improve_answer(self, state: Dict, texts: List[str]) -> Dict:
         """
@@ -569,6 +673,22 @@ def io() -> operations.GraphOfOperations:
 
     return operations_graph
 
+def io_batch() -> operations.GraphOfOperations:
+    """
+    Generates the Graph of Operations for the batched IO method.
+    同一需求文档的所有候选功能点共用一次请求，各样本从同一回答中取出自己的结果。
+
+    :return: Graph of Operations
+    :rtype: GraphOfOperations
+    """
+    operations_graph = operations.GraphOfOperations()
+
+    operations_graph.append_operation(operations.Generate(1, 1))
+    operations_graph.append_operation(operations.Score(1, False, score_assessment))
+    operations_graph.append_operation(operations.GroundTruth(test_eif_assessment))
+
+    return operations_graph
+
 def cot() -> operations.GraphOfOperations:
     """
     Generates the Graph of Operations for the CoT method.
@@ -593,21 +713,10 @@ def tot() -> operations.GraphOfOperations:
     """
     operations_graph = operations.GraphOfOperations()
 
-    # 目前有问题，deepseek不支持试用参数n生成多个回复choices
-    operations_graph.append_operation(operations.Generate(1, 1))
-    operations_graph.append_operation(operations.Score(1, False, score_assessment))
-    keep_best_1 = operations.KeepBestN(1, True)  # True: 选择最高分数
-    operations_graph.append_operation(keep_best_1)
-
-    for _ in range(3):
-        operations_graph.append_operation(operations.Generate(1, 1))
-        operations_graph.append_operation(operations.Score(1, False, score_assessment))
-        keep_best_2 = operations.KeepBestN(1, True)  # True: 选择最高分数
-        keep_best_2.add_predecessor(keep_best_1)
-        operations_graph.append_operation(keep_best_2)
-        keep_best_1 = keep_best_2
-
-    operations_graph.append_operation(operations.KeepBestN(1, True))  # True: 选择最高分数
+    # 一次请求并行采样多条推理路径（参数n），再按最终答案多数投票（self-consistency），
+    # 取代原先串行的四轮"生成-评分-保留"。采样数取奇数，避免二分类平票。
+    operations_graph.append_operation(operations.Generate(1, 5))
+    operations_graph.append_operation(operations.Selector(majority_vote))
     operations_graph.append_operation(operations.GroundTruth(test_eif_assessment))
 
     return operations_graph
@@ -616,18 +725,16 @@ def got() -> operations.GraphOfOperations:
     """
     Generates the Graph of Operations for the GoT method.
     使用图结构来分析EIF判断问题：
-    1. 从三个不同视角分析（用户视角、系统视角、IFPUG规则视角）
-    2. 每个视角生成多个思路并选择最佳
-    3. 合并和验证结果
+    1. 从三个不同视角并行分析（用户视角、系统视角、IFPUG规则视角）
+    2. 一次合并调用综合三个视角的结果
+    3. 验证结果
     """
     operations_graph = operations.GraphOfOperations()
 
-    # 1. 从三个不同视角进行分析
+    # 1. 从三个不同视角进行分析（互不依赖）
     perspectives = ["用户视角", "系统视角", "IFPUG规则视角"]
-    perspective_results = []
-    
+    merge = operations.Aggregate(1)
     for perspective in perspectives:
-        # 1.1 生成该视角的分析
         generate = operations.Generate(1, 1)
         # 将视角信息添加到初始状态中
         generate.initial_state = {
@@ -635,49 +742,201 @@ def got() -> operations.GraphOfOperations:
             "phase": "analysis"
         }
         operations_graph.add_operation(generate)
+        merge.add_predecessor(generate)
 
-        # 1.2 评分
-        score = operations.Score(1, False, score_assessment)
-        score.add_predecessor(generate)
-        operations_graph.add_operation(score)
-        
-        # 1.3 保留最佳结果
-        keep_best = operations.KeepBestN(1, True)
-        keep_best.add_predecessor(score)
-        operations_graph.add_operation(keep_best)
-        
-        perspective_results.append(keep_best)
-
-    # 2. 合并三个视角的结果
-    merge = operations.Generate(1, 1)
-    # 设置合并阶段的状态
-    merge.initial_state = {
-        "phase": "merge",
-        "merge_perspectives": True
-    }
-    for result in perspective_results:
-        merge.add_predecessor(result)
+    # 2. 合并三个视角的结果，其答案即为最终判断
     operations_graph.add_operation(merge)
 
-    # 3. 评分和选择最终结果
-    final_score = operations.Score(1, False, score_assessment)
-    final_score.add_predecessor(merge)
-    operations_graph.add_operation(final_score)
+    # 3. 验证
+    operations_graph.append_operation(operations.GroundTruth(test_eif_assessment))
 
-    final_keep = operations.KeepBestN(1, True)
-    final_keep.add_predecessor(final_score)
-    operations_graph.add_operation(final_keep)
+    return operations_graph
+
+def triaged() -> operations.GraphOfOperations:
+    """
+    Generates the Graph of Operations for candidates already decided by triage.
+    不调用语言模型，只记录预筛选的结果并与标准答案比较。
 
-    # 4. 验证
+    :return: Graph of Operations
+    :rtype: GraphOfOperations
+    """
+    operations_graph = operations.GraphOfOperations()
+
+    operations_graph.append_operation(operations.Selector(triage_answer))
     operations_graph.append_operation(operations.GroundTruth(test_eif_assessment))
 
     return operations_graph
 
-def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperations]], budget: float, lm_name: str) -> float:
+# 语言模型配置文件
+LM_CONFIG_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "../../graph_of_thoughts/language_models/config.json",
+)
+
+def _create_lm(lm_name: str) -> language_models.AbstractLanguageModel:
+    """
+    Create the language model used by the experiment jobs.
+
+    :param lm_name: Name of the language model to be used.
+    :type lm_name: str
+    :return: Language model with response caching enabled.
+    :rtype: AbstractLanguageModel
+    """
+    return language_models.ChatGPT(
+        LM_CONFIG_PATH,
+        model_name=lm_name,
+        cache=True,
+    )
+
+def _run_one(data: List, method: Callable[[], operations.GraphOfOperations], lm_name: str, results_folder: str,
+             lm: language_models.AbstractLanguageModel = None, candidates: List[str] = None,
+             prefilter: bool = False) -> float:
+    """
+    Run a single method on a single sample and store its graph.
+
+    Every job gets its own graph and controller, and its own language model
+    unless one is passed in, so jobs can run on separate threads without
+    sharing state.
+
+    :param data: Sample row [id, candidate_name, requirement_text, ground_truth].
+    :type data: List
+    :param method: Function that generates the Graph of Operations.
+    :type method: Callable[[], operations.GraphOfOperations]
+    :param lm_name: Name of the language model to be used.
+    :type lm_name: str
+    :param results_folder: Folder of the current run.
+    :type results_folder: str
+    :param lm: Language model shared with other jobs of the same document. Its usage
+               counters are reset so that only this job's cost is reported. Defaults to None.
+    :type lm: AbstractLanguageModel
+    :param candidates: All candidate names of the sample's document, for batched methods. Defaults to None.
+    :type candidates: List[str]
+    :param prefilter: Whether candidates decided by triage skip the method's graph. Defaults to False.
+    :type prefilter: bool
+    :return: Cost of the job in dollars.
+    :rtype: float
+    """
+    logging.info(f"Running method {method.__name__} on data {data[0]}: {data[1]}")
+    if lm is None:
+        lm = _create_lm(lm_name)
+    else:
+        lm.prompt_tokens = 0
+        lm.completion_tokens = 0
+        lm.cost = 0.0
+    state = {
+        "requirement_text": data[2],
+        "candidate_name": data[1],
+        "ground_truth": data[3],
+        "current": "",
+        "method": method.__name__,
+    }
+    if candidates is not None:
+        state["candidates"] = candidates
+    if prefilter and triage(data[1]) is not None:
+        logging.info(f"Candidate {data[1]} decided by triage, skipping the language model")
+        operations_graph = triaged()
+    else:
+        operations_graph = method()
+    executor = controller.Controller(
+        lm,
+        operations_graph,
+        FunctionPointPrompter(),
+        FunctionPointParser(),
+        state,
+    )
+    try:
+        executor.run()
+    except Exception as e:
+        logging.error(f"Exception: {e}")
+    path = os.path.join(
+        results_folder,
+        method.__name__,
+        f"{data[0]}.json",
+    )
+    executor.output_graph(path)
+    return lm.cost
+
+
+def _fingerprint(method_name: str, data: List, prefilter: bool, lm_settings: str, candidates: List[str] = None) -> str:
+    """
+    Fingerprint of everything that determines the result of a job apart from the code.
+
+    :param method_name: Name of the method.
+    :type method_name: str
+    :param data: Sample row [id, candidate_name, requirement_text, ground_truth].
+    :type data: List
+    :param prefilter: Whether the job uses triage.
+    :type prefilter: bool
+    :param lm_settings: Endpoint, model id and sampling settings of the language model.
+    :type lm_settings: str
+    :param candidates: All candidate names of the sample's document, for batched methods. Defaults to None.
+    :type candidates: List[str]
+    :return: Hex digest of the job inputs.
+    :rtype: str
+    """
+    key = f"{method_name}|{prefilter}|{lm_settings}|{data[1]}|{data[2]}|{data[3]}"
+    if candidates is not None:
+        key += "|" + "|".join(candidates)
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+def _source_mtime() -> float:
+    """
+    Latest modification time of the code and configuration that produce a result:
+    本文件（提示词和图的定义）、语言模型配置文件以及 graph_of_thoughts 包的源码。
+
+    :return: Modification time in seconds since the epoch.
+    :rtype: float
+    """
+    mtimes = [os.path.getmtime(__file__), os.path.getmtime(LM_CONFIG_PATH)]
+    for root, _, files in os.walk(os.path.dirname(graph_of_thoughts.__file__)):
+        mtimes.extend(os.path.getmtime(os.path.join(root, name)) for name in files if name.endswith(".py"))
+    return max(mtimes)
+
+def _previous_results(results_dir: str, lm_name: str) -> Dict[str, str]:
+    """
+    Collect the result files of earlier runs with the same language model, keyed by job fingerprint.
+    只保留比产生结果的代码和配置（见 _source_mtime）更新的结果。
+
+    :param results_dir: Directory that holds the run folders.
+    :type results_dir: str
+    :param lm_name: Name of the language model.
+    :type lm_name: str
+    :return: Mapping from fingerprint to result file.
+    :rtype: Dict[str, str]
+    """
+    source_mtime = _source_mtime()
+    found = {}
+    with os.scandir(results_dir) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            try:
+                with open(os.path.join(entry.path, "config.json"), "r", encoding="utf-8") as f:
+                    config = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if config.get("lm") != lm_name:
+                continue
+            for method_name, fingerprints in config.get("fingerprints", {}).items():
+                for data_id, fingerprint in fingerprints.items():
+                    path = os.path.join(entry.path, method_name, f"{data_id}.json")
+                    try:
+                        if os.path.getmtime(path) > source_mtime:
+                            found[fingerprint] = path
+                    except OSError:
+                        continue
+    return found
+
+def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperations]], budget: float, lm_name: str, max_workers: int = 8,
+        prefilter: bool = False, reuse_results: bool = False) -> float:
     """
     Controller function that executes each specified method for each specified
     sample while the budget is not exhausted.
 
+    The sample/method jobs are I/O bound on the language model, so they run
+    concurrently on a thread pool. The budget is checked before each job
+    starts, so jobs already in flight may overshoot it slightly.
+
     :param data_ids: Indices of the sample to be run.
     :type data_ids: List[int]
     :param methods: List of functions to generate Graphs of Operations.
@@ -686,26 +945,57 @@ def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperat
     :type budget: float
     :param lm_name: Name of the language model to be used.
     :type lm_name: str
+    :param max_workers: Maximum number of jobs running at the same time. Defaults to 8.
+    :type max_workers: int
+    :param prefilter: Whether candidates that triage can decide from their name skip the
+                      language model. Off by default so that methods are compared on all samples.
+    :type prefilter: bool
+    :param reuse_results: Whether jobs whose inputs match a result of an earlier run with the same
+                          language model copy that result instead of running again. Defaults to False.
+    :type reuse_results: bool
     :return: Spent budget in dollars.
     :rtype: float
     """
-    orig_budget = budget
     data_path = os.path.join(os.path.dirname(__file__), "eif_samples.csv")
-    data = []
-    with open(data_path, "r", encoding="gbk") as f:  # 使用 GBK 编码
+    # 只解析被选中的样本行；全部找到后即停止读取
+    wanted = set(data_ids) if data_ids else None
+    rows = {}
+    with open(data_path, "r", encoding="utf-8-sig", newline="") as f:  # UTF-8（带BOM，兼容Excel）
         reader = csv.reader(f)
         next(reader)  # Skip header
-        for row in reader:
-            data.append([int(row[0]), row[1], row[2], row[3] == "TRUE"])
+        for i, row in enumerate(reader):
+            if wanted is None or i in wanted:
+                rows[i] = [int(row[0]), row[1], row[2], row[3] == "TRUE"]
+                if wanted is not None and len(rows) == len(wanted):
+                    break
 
     if data_ids is None or len(data_ids) == 0:
-        data_ids = list(range(len(data)))
-    selected_data = [data[i] for i in data_ids]
+        data_ids = list(rows)
+    selected_data = [rows[i] for i in data_ids]
 
     results_dir = os.path.join(os.path.dirname(__file__), "results")
 
     if not os.path.exists(results_dir):
         os.makedirs(results_dir)
+    previous_results = _previous_results(results_dir, lm_name) if reuse_results else {}
+
+    # 按需求文档分组：批量方法的同组样本共用一次请求
+    documents = {}
+    for data in selected_data:
+        documents.setdefault(data[2], []).append(data)
+
+    lm_settings = _create_lm(lm_name).settings
+    fingerprints = {
+        method.__name__: {
+            data[0]: _fingerprint(
+                method.__name__, data, prefilter, lm_settings,
+                [d[1] for d in documents[data[2]]] if method.__name__.startswith("io_batch") else None,
+            )
+            for data in selected_data
+        }
+        for method in methods
+    }
+
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     extra_info = f"{lm_name}_{'-'.join([method.__name__ for method in methods])}"
     folder_name = f"{extra_info}_{timestamp}"
@@ -717,69 +1007,72 @@ def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperat
         "methods": [method.__name__ for method in methods],
         "lm": lm_name,
         "budget": budget,
+        "prefilter": prefilter,
+        "fingerprints": fingerprints,
     }
     with open(os.path.join(results_folder, "config.json"), "w", encoding="utf-8") as f:
         json.dump(config, f, ensure_ascii=False, indent=2)
 
-    logging.basicConfig(
-        filename=os.path.join(results_folder, "log.log"),
-        filemode="w",
-        format="%(name)s - %(levelname)s - %(message)s",
-        level=logging.DEBUG,
-        encoding="utf-8"
-    )
+    # 工作线程只把日志记录放入队列，由单独的监听线程写入文件
+    file_handler = logging.FileHandler(os.path.join(results_folder, "log.log"), mode="w", encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter("%(name)s - %(levelname)s - %(message)s"))
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    root_logger = logging.getLogger()
+    if not root_logger.handlers:
+        root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(queue_handler)
+    listener.start()
 
     for method in methods:
         # create a results directory for the method
         os.makedirs(os.path.join(results_folder, method.__name__))
 
-    for data in selected_data:
-        logging.info(f"Running data {data[0]}: {data[1]}")
-        if budget <= 0.0:
-            logging.error(f"Budget has been depleted, stopping. Data {data[0]} has not been run.")
-            break
-        for method in methods:
-            logging.info(f"Running method {method.__name__}")
-            logging.info(f"Budget left: {budget}")
-            if budget <= 0.0:
-                logging.error(f"Budget has been depleted, stopping. Method {method.__name__} has not been run.")
-                break
-
-            lm = language_models.ChatGPT(
-                os.path.join(
-                    os.path.dirname(__file__),
-                    "../../graph_of_thoughts/language_models/config.json",
-                ),
-                model_name=lm_name,
-                cache=True,
-            )
-            operations_graph = method()
-            executor = controller.Controller(
-                lm,
-                operations_graph,
-                FunctionPointPrompter(),
-                FunctionPointParser(),
-                {
-                    "requirement_text": data[2],
-                    "candidate_name": data[1],
-                    "ground_truth": data[3],
-                    "current": "",
-                    "method": method.__name__,
-                },
-            )
-            try:
-                executor.run()
-            except Exception as e:
-                logging.error(f"Exception: {e}")
-            path = os.path.join(
-                results_folder,
-                method.__name__,
-                f"{data[0]}.json",
-            )
-            executor.output_graph(path)
-            budget -= lm.cost
+    # 预算在多个线程之间共享，需要加锁
+    budget_lock = threading.Lock()
+    spent = 0.0
+
+    def job(data, method, lm=None, candidates=None):
+        nonlocal spent
+        previous = previous_results.get(fingerprints[method.__name__][data[0]])
+        if previous is not None:
+            logging.info(f"Reusing {previous} for method {method.__name__} on data {data[0]}")
+            shutil.copyfile(previous, os.path.join(results_folder, method.__name__, f"{data[0]}.json"))
+            return
+        with budget_lock:
+            if budget - spent <= 0.0:
+                logging.error(f"Budget has been depleted, stopping. Method {method.__name__} has not been run on data {data[0]}.")
+                return
+            logging.info(f"Budget left: {budget - spent}")
+        cost = _run_one(data, method, lm_name, results_folder, lm, candidates, prefilter)
+        with budget_lock:
+            spent += cost
+
+    # 批量方法：同组样本依次运行并共用一个带缓存的模型，
+    # 第一个样本的请求结果会被其余样本直接复用
+    def batch_job(group, method):
+        lm = _create_lm(lm_name)
+        candidates = [data[1] for data in group]
+        for data in group:
+            job(data, method, lm, candidates)
 
-    return orig_budget - budget
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = []
+            for method in methods:
+                if method.__name__.startswith("io_batch"):
+                    futures.extend(pool.submit(batch_job, group, method) for group in documents.values())
+                else:
+                    futures.extend(pool.submit(job, data, method) for data in selected_data)
+            for future in futures:
+                future.result()
+    finally:
+        root_logger.removeHandler(queue_handler)
+        listener.stop()
+        file_handler.close()
+
+    return spent
 
 if __name__ == "__main__":
     """
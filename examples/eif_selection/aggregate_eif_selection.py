@@ -1,6 +1,21 @@
 import os
 import json
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _load(path):
+    """Parse a JSON file, using orjson when it is installed."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 def aggregate_eif_selection():
     output_file = os.path.join(os.path.dirname(__file__), "..", "..", "mypaper", "experiment", "section_5.2_results_eif_selection.md")
     lines = []
@@ -11,34 +26,30 @@ def aggregate_eif_selection():
     lines.append("| :--- | :---: | :---: | :---: | :---: | :---: | :---: | :---: | :---: |")
 
     results_dir = os.path.join(os.path.dirname(__file__), "results")
-    for folder in sorted(os.listdir(results_dir)):
-        folder_path = os.path.join(results_dir, folder)
-        if not os.path.isdir(folder_path):
-            continue
-            
+    with os.scandir(results_dir) as it:
+        folders = sorted((entry.name, entry.path) for entry in it if entry.is_dir(follow_symlinks=False))
+    for folder, folder_path in folders:
         parts = folder.split('_')
         if len(parts) < 2:
             continue
         method = parts[1]
         
         subdir = os.path.join(folder_path, method)
-        if not os.path.exists(subdir):
+        # 一次列出样本文件，避免逐个探测 1.json…10.json
+        try:
+            with os.scandir(subdir) as it:
+                present = {entry.name: entry.path for entry in it}
+        except OSError:
             continue
             
-        total_exact = 0
-        total_fuzzy = 0.0
-        sum_precision = 0.0
-        sum_recall = 0.0
-        total_cost = 0.0
-        count = 0
-        solved_count = 0
+        # 每个样本一行：exact, fuzzy, precision, recall, cost, solved
+        rows = []
         
         for i in range(1, 11): 
-            file_path = os.path.join(subdir, f"{i}.json")
-            if os.path.exists(file_path):
+            file_path = present.get(f"{i}.json")
+            if file_path is not None:
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
+                    data = _load(file_path)
                     
                     sample_metrics = None
                     problem_solved = False
@@ -59,19 +70,24 @@ def aggregate_eif_selection():
                         cost = data[-1]["cost"]
                     
                     if sample_metrics:
-                        total_exact += sample_metrics.get("exact_matches", 0)
-                        total_fuzzy += sample_metrics.get("fuzzy_score", 0.0)
-                        sum_precision += sample_metrics.get("precision", 0.0)
-                        sum_recall += sample_metrics.get("recall", 0.0)
-                        total_cost += cost
-                        count += 1
-                        if problem_solved:
-                            solved_count += 1
+                        rows.append((
+                            sample_metrics.get("exact_matches", 0),
+                            sample_metrics.get("fuzzy_score", 0.0),
+                            sample_metrics.get("precision", 0.0),
+                            sample_metrics.get("recall", 0.0),
+                            cost,
+                            1 if problem_solved else 0,
+                        ))
                             
                 except Exception as e:
                     print(f"Error parsing {file_path}: {e}")
         
-        if count > 0:
+        if rows:
+            count = len(rows)
+            totals = np.asarray(rows, dtype=float).sum(axis=0)
+            total_exact = int(totals[0])
+            total_fuzzy, sum_precision, sum_recall, total_cost = totals[1:5]
+            solved_count = int(totals[5])
             m_total = total_exact + total_fuzzy
             avg_precision = sum_precision / count
             avg_recall = sum_recall / count
@@ -8,17 +8,91 @@
 
 import os
 import logging
+import logging.handlers
+import contextvars
 import datetime
 import json
-import csv
+import queue
 import re
-from functools import partial, total_ordering
-from typing import Dict, List, Callable, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial, total_ordering
+from typing import Dict, List, Callable, Tuple, Union
+
+import numpy as np
+import pandas as pd
 from graph_of_thoughts import controller, language_models, operations, prompter, parser
 
 # 全局配置：用于语义相似度判断的LLM实例
 _GLOBAL_LM_FOR_SCORING = None
 _USE_LLM_SEMANTIC = False  # 默认关闭（避免额外成本）
+# 并发运行实验时，每个任务使用自己设置的评分LLM (lm, use_semantic)（未设置时使用上面的全局配置）；
+# 使用上下文变量，使控制器在工作线程中执行的评分操作也能取到
+_SCORING_CONTEXT: contextvars.ContextVar = contextvars.ContextVar("_SCORING_CONTEXT")
+# 逐对语义相似度判断的最大并发请求数
+SIMILARITY_WORKERS = 8
+# 同一个图中可同时执行的独立操作数（got 的三个视角分支）
+OPERATION_WORKERS = 3
+# 图执行出错时的最多尝试次数；重试时已完成操作的请求由 lm 的响应缓存直接返回，不会重复计费
+JOB_ATTEMPTS = 2
+# LLM语义相似度结果缓存，键为 (模型名称, 排序后的标准化名称对)；只缓存LLM给出的分数
+_SIM_CACHE: Dict[tuple, float] = {}
+# 相似度缓存的命中/未命中次数（按名称对的查找计数），运行结束时写入日志
+_SIM_CACHE_STATS = {"hits": 0, "misses": 0}
+_SIM_CACHE_STATS_LOCK = threading.Lock()
+# 答案评估结果缓存，键为 (模型名称, 是否语义匹配, 预测列表, 真实列表)；Score 与 GroundTruth 共用
+_METRICS_CACHE: Dict[tuple, Dict] = {}
+
+# 名称标准化使用的正则（模块加载时编译一次）
+_RE_PAREN_EN = re.compile(r'\([^)]*\)')
+_RE_PAREN_CN = re.compile(r'（[^）]*）')
+# 批量标准化时用分隔符拼接名称，括号匹配不能跨越分隔符
+_NAME_SEP = '\x1f'
+_RE_PAREN_EN_JOINED = re.compile(r'\([^)\x1f]*\)')
+_RE_PAREN_CN_JOINED = re.compile(r'（[^）\x1f]*）')
+# LLM相似度回答中的分数（单个名称对 / 批量 "A1-B1: 0.95"）
+_RE_SCORE = re.compile(r'(\d+\.?\d*)')
+_RE_PAIR_SCORE = re.compile(r'A(\d+)\s*[-–—]\s*B(\d+)\s*[：:]\s*(\d+\.?\d*)')
+
+# 语义相似度判断的提示词模板（单个名称对 / 两组名称两两判断）
+_SEMANTIC_PROMPT_TMPL = """你是一个IFPUG功能点分析专家。请判断以下两个EIF（外部接口文件）功能点名称是否指代同一个功能点。
+
+功能点1: {name1}
+功能点2: {name2}
+
+请分析：
+1. 它们是否指代相同的外部数据源或接口？
+2. 考虑中英文翻译、同义词、缩写等因素
+3. 只要语义相同即可，不需要完全字面匹配
+
+请直接回答相似度分数（0.0到1.0之间的小数）：
+- 1.0: 完全相同的功能点
+- 0.8-0.9: 高度相似，很可能是同一个功能点
+- 0.5-0.7: 中等相似，可能相关
+- 0.0-0.4: 不相似或不相关
+
+只需要回答一个数字，格式：0.95"""
+
+_SEMANTIC_BATCH_PROMPT_TMPL = """你是一个IFPUG功能点分析专家。请判断以下两组EIF（外部接口文件）功能点名称中，每一对名称是否指代同一个功能点。
+
+[预测功能点]
+{list1}
+
+[标准功能点]
+{list2}
+
+请分析：
+1. 它们是否指代相同的外部数据源或接口？
+2. 考虑中英文翻译、同义词、缩写等因素
+3. 只要语义相同即可，不需要完全字面匹配
+
+请对每一对名称给出相似度分数（0.0到1.0之间的小数）：
+- 1.0: 完全相同的功能点
+- 0.8-0.9: 高度相似，很可能是同一个功能点
+- 0.5-0.7: 中等相似，可能相关
+- 0.0-0.4: 不相似或不相关
+
+每对名称单独一行，只输出编号和分数，格式：A1-B1: 0.95"""
 
 def set_scoring_lm(lm, use_semantic: bool = False):
     """
@@ -32,8 +106,19 @@ def set_scoring_lm(lm, use_semantic: bool = False):
     global _GLOBAL_LM_FOR_SCORING, _USE_LLM_SEMANTIC
     _GLOBAL_LM_FOR_SCORING = lm
     _USE_LLM_SEMANTIC = use_semantic
+    _SCORING_CONTEXT.set((lm, use_semantic))
     logging.info(f"Scoring LLM set, semantic matching: {use_semantic}")
 
+def _scoring_lm() -> Tuple[object, bool]:
+    """
+    获取当前任务用于评分的LLM实例及是否启用语义相似度判断。
+    
+    :return: (语言模型实例, 是否启用LLM语义相似度判断)
+    :rtype: Tuple[language_models.AbstractLanguageModel, bool]
+    """
+    return _SCORING_CONTEXT.get((_GLOBAL_LM_FOR_SCORING, _USE_LLM_SEMANTIC))
+
+@lru_cache(maxsize=4096)
 def normalize_eif_name(name: str) -> str:
     """
     标准化EIF功能点名称，用于比较。
@@ -48,10 +133,57 @@ def normalize_eif_name(name: str) -> str:
     # 去除多余空格
     name = ' '.join(name.split())
     # 去除括号内容
-    name = re.sub(r'\([^)]*\)', '', name)
-    name = re.sub(r'（[^）]*）', '', name)
+    name = _RE_PAREN_EN.sub('', name)
+    name = _RE_PAREN_CN.sub('', name)
     return name.strip()
 
+def normalize_eif_names(names: List[str]) -> List[str]:
+    """
+    批量标准化EIF功能点名称，结果与逐个调用 normalize_eif_name 相同。
+    名称用分隔符拼接后，每个括号正则只在整个字符串上执行一次。
+    
+    :param names: EIF功能点名称列表
+    :type names: List[str]
+    :return: 标准化后的名称列表
+    :rtype: List[str]
+    """
+    if not names:
+        return []
+    if any(_NAME_SEP in name for name in names):
+        return [normalize_eif_name(name) for name in names]
+    joined = _NAME_SEP.join(' '.join(name.lower().split()) for name in names)
+    joined = _RE_PAREN_EN_JOINED.sub('', joined)
+    joined = _RE_PAREN_CN_JOINED.sub('', joined)
+    return [name.strip() for name in joined.split(_NAME_SEP)]
+
+def _similarity_cache_key(name1: str, name2: str, lm) -> tuple:
+    """
+    计算语义相似度缓存的键。相似度是对称的，因此名称对按排序后存储。
+    
+    :param name1: 第一个功能点名称
+    :type name1: str
+    :param name2: 第二个功能点名称
+    :type name2: str
+    :param lm: 给出相似度的语言模型实例
+    :type lm: language_models.AbstractLanguageModel
+    :return: 缓存键
+    :rtype: tuple
+    """
+    return (getattr(lm, "model_name", None),) + tuple(sorted((normalize_eif_name(name1), normalize_eif_name(name2))))
+
+def _record_sim_cache_lookups(hits: int, misses: int) -> None:
+    """
+    累计相似度缓存的命中和未命中次数。
+    
+    :param hits: 命中次数
+    :type hits: int
+    :param misses: 未命中次数
+    :type misses: int
+    """
+    with _SIM_CACHE_STATS_LOCK:
+        _SIM_CACHE_STATS["hits"] += hits
+        _SIM_CACHE_STATS["misses"] += misses
+
 def check_eif_semantic_similarity(name1: str, name2: str, lm=None, use_lm: bool = True) -> float:
     """
     使用LLM判断两个EIF功能点名称是否语义相同。
@@ -71,24 +203,14 @@ def check_eif_semantic_similarity(name1: str, name2: str, lm=None, use_lm: bool
     if not use_lm or lm is None:
         return _string_similarity(name1, name2)
     
+    key = _similarity_cache_key(name1, name2, lm)
+    cached = _SIM_CACHE.get(key)
+    _record_sim_cache_lookups(int(cached is not None), int(cached is None))
+    if cached is not None:
+        return cached
+    
     # 使用LLM进行语义相似度判断
-    prompt = f"""你是一个IFPUG功能点分析专家。请判断以下两个EIF（外部接口文件）功能点名称是否指代同一个功能点。
-
-功能点1: {name1}
-功能点2: {name2}
-
-请分析：
-1. 它们是否指代相同的外部数据源或接口？
-2. 考虑中英文翻译、同义词、缩写等因素
-3. 只要语义相同即可，不需要完全字面匹配
-
-请直接回答相似度分数（0.0到1.0之间的小数）：
-- 1.0: 完全相同的功能点
-- 0.8-0.9: 高度相似，很可能是同一个功能点
-- 0.5-0.7: 中等相似，可能相关
-- 0.0-0.4: 不相似或不相关
-
-只需要回答一个数字，格式：0.95"""
+    prompt = _SEMANTIC_PROMPT_TMPL.format(name1=name1, name2=name2)
 
     try:
         # 使用query方法调用LLM
@@ -99,26 +221,106 @@ def check_eif_semantic_similarity(name1: str, name2: str, lm=None, use_lm: bool
         if response_texts and len(response_texts) > 0:
             # 提取数字
             text = response_texts[0].strip()
-            logging.debug(f"LLM response for similarity check: '{text}'")
-            match = re.search(r'(\d+\.?\d*)', text)
+            logging.debug("LLM response for similarity check: '%s'", text)
+            match = _RE_SCORE.search(text)
             if match:
                 score = float(match.group(1))
                 # 确保在0-1范围内
                 score = max(0.0, min(1.0, score))
-                logging.debug(f"LLM semantic similarity for '{name1}' vs '{name2}': {score}")
+                logging.debug("LLM semantic similarity for '%s' vs '%s': %s", name1, name2, score)
+                _SIM_CACHE[key] = score
                 return score
             else:
-                logging.warning(f"Could not extract score from LLM response: '{text}'")
+                logging.warning("Could not extract score from LLM response: '%s'", text)
         else:
-            logging.warning(f"Empty response from LLM for similarity check")
+            logging.warning("Empty response from LLM for similarity check")
     except Exception as e:
-        logging.warning(f"Error using LLM for semantic similarity: {e}")
+        logging.warning("Error using LLM for semantic similarity: %s", e)
     
     # 如果LLM调用失败，回退到字符串相似度
     fallback_score = _string_similarity(name1, name2)
-    logging.warning(f"Falling back to string similarity for '{name1}' vs '{name2}': {fallback_score:.2f}")
+    logging.warning("Falling back to string similarity for '%s' vs '%s': %.2f", name1, name2, fallback_score)
     return fallback_score
 
+def check_eif_semantic_similarity_batch(names1: List[str], names2: List[str], lm=None, use_lm: bool = True) -> List[List[float]]:
+    """
+    使用一次LLM调用判断两组EIF功能点名称两两之间的语义相似度。
+    
+    :param names1: 第一组功能点名称（预测）
+    :type names1: List[str]
+    :param names2: 第二组功能点名称（标准答案）
+    :type names2: List[str]
+    :param lm: 语言模型实例（可选）
+    :type lm: language_models.AbstractLanguageModel
+    :param use_lm: 是否使用LLM进行语义判断
+    :type use_lm: bool
+    :return: 相似度矩阵，scores[i][j] 为 names1[i] 与 names2[j] 的相似度 (0.0 - 1.0)
+    :rtype: List[List[float]]
+    """
+    scores = [[None] * len(names2) for _ in names1]
+    
+    if use_lm and lm is not None:
+        # 先取缓存中已有的分数，只把仍有未知名称对的行和列放进提示词
+        for i, name1 in enumerate(names1):
+            for j, name2 in enumerate(names2):
+                scores[i][j] = _SIM_CACHE.get(_similarity_cache_key(name1, name2, lm))
+        misses = sum(row.count(None) for row in scores)
+        _record_sim_cache_lookups(len(names1) * len(names2) - misses, misses)
+        rows = [i for i in range(len(names1)) if None in scores[i]]
+        cols = [j for j in range(len(names2)) if any(scores[i][j] is None for i in rows)]
+    else:
+        rows, cols = [], []
+    
+    if rows and cols:
+        list1 = "\n".join(f"A{a}: {names1[i]}" for a, i in enumerate(rows, 1))
+        list2 = "\n".join(f"B{b}: {names2[j]}" for b, j in enumerate(cols, 1))
+        prompt = _SEMANTIC_BATCH_PROMPT_TMPL.format(list1=list1, list2=list2)
+        
+        try:
+            query_response = lm.query(prompt, num_responses=1)
+            response_texts = lm.get_response_texts(query_response)
+            text = response_texts[0] if response_texts else ""
+            logging.debug("LLM response for batch similarity check: '%s'", text)
+            for match in _RE_PAIR_SCORE.finditer(text):
+                a, b = int(match.group(1)) - 1, int(match.group(2)) - 1
+                if 0 <= a < len(rows) and 0 <= b < len(cols):
+                    i, j = rows[a], cols[b]
+                    # 确保在0-1范围内
+                    scores[i][j] = max(0.0, min(1.0, float(match.group(3))))
+                    _SIM_CACHE[_similarity_cache_key(names1[i], names2[j], lm)] = scores[i][j]
+        except Exception as e:
+            logging.warning("Error using LLM for batch semantic similarity: %s", e)
+    
+    missing = [(i, j) for i in range(len(names1)) for j in range(len(names2)) if scores[i][j] is None]
+    if missing and use_lm and lm is not None:
+        # 批量回答中缺失的名称对逐对判断，并发发出请求（失败时各自回退到字符串相似度）
+        logging.warning("Checking %d of %d name pairs one by one", len(missing), len(names1) * len(names2))
+        with ThreadPoolExecutor(max_workers=min(SIMILARITY_WORKERS, len(missing))) as pool:
+            results = pool.map(
+                lambda pair: check_eif_semantic_similarity(names1[pair[0]], names2[pair[1]], lm, use_lm=True),
+                missing
+            )
+            for (i, j), score in zip(missing, results):
+                scores[i][j] = score
+    elif missing:
+        fallback = _string_similarity_matrix(names1, names2)
+        for i, j in missing:
+            scores[i][j] = fallback[i][j]
+    return scores
+
+def _unique_with_inverse(names: List[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    按首次出现的顺序去重，并返回每个名称在去重列表中的位置。
+    
+    :param names: 名称列表
+    :type names: List[str]
+    :return: 去重后的名称列表，以及满足 uniq[inverse[i]] == names[i] 的索引数组
+    :rtype: Tuple[List[str], np.ndarray]
+    """
+    index: Dict[str, int] = {}
+    inverse = [index.setdefault(name, len(index)) for name in names]
+    return list(index), np.asarray(inverse, dtype=int)
+
 def calculate_eif_similarity(predicted: List[str], ground_truth: List[str], lm=None, use_lm_semantic: bool = True) -> Dict:
     """
     计算预测的EIF功能点列表和真实答案的相似度。
@@ -157,8 +359,8 @@ def calculate_eif_similarity(predicted: List[str], ground_truth: List[str], lm=N
         }
     
     # 标准化所有名称
-    pred_normalized = [normalize_eif_name(p) for p in predicted]
-    truth_normalized = [normalize_eif_name(t) for t in ground_truth]
+    pred_normalized = normalize_eif_names(predicted)
+    truth_normalized = normalize_eif_names(ground_truth)
     
     # 精确匹配
     pred_set = set(pred_normalized)
@@ -171,47 +373,46 @@ def calculate_eif_similarity(predicted: List[str], ground_truth: List[str], lm=N
     unmatched_truth = [(t, ground_truth[i]) for i, t in enumerate(truth_normalized) if t not in pred_set]
     
     fuzzy_score = 0.0
-    matched_truth = set()  # 存储已匹配的原始名称（而非标准化名称）
     match_details = []
     
-    for pred_norm, pred_orig in unmatched_pred:
-        max_similarity = 0.0
-        best_match = None
-        best_match_orig = None
+    # 所有名称都已精确匹配（或一方没有剩余名称）时无需计算相似度，也不调用LLM
+    if unmatched_pred and unmatched_truth:
+        # 使用LLM时，一次请求得到所有未匹配名称对的相似度矩阵，而不是逐对调用
+        use_lm_scores = use_lm_semantic and lm is not None
+        # LLM判断原始名称，字符串相似度比较标准化名称；重复的名称只计算一次，再按索引展开回完整矩阵
+        pick = (lambda pair: pair[1]) if use_lm_scores else (lambda pair: pair[0])
+        uniq_pred, pred_inv = _unique_with_inverse([pick(pair) for pair in unmatched_pred])
+        uniq_truth, truth_inv = _unique_with_inverse([pick(pair) for pair in unmatched_truth])
+        if use_lm_scores:
+            similarities = check_eif_semantic_similarity_batch(uniq_pred, uniq_truth, lm, use_lm=True)
+        else:
+            # 回退到字符串相似度（一次算出整个矩阵）
+            similarities = _string_similarity_matrix(uniq_pred, uniq_truth)
+    
+        # 贪心匹配：每个预测名称依次取尚未匹配的真实名称中相似度最高的一个（相同分数取靠前的）
+        scores = np.asarray(similarities, dtype=float)[pred_inv][:, truth_inv]
+        truth_norms = [truth_norm for truth_norm, _ in unmatched_truth]
+        truth_origs = np.array([truth_orig for _, truth_orig in unmatched_truth], dtype=object)
+        truth_used = np.zeros(len(unmatched_truth), dtype=bool)
+        for i, (pred_norm, pred_orig) in enumerate(unmatched_pred):
+            row = np.where(truth_used, -1.0, scores[i])
+            j = int(row.argmax())
+            max_similarity = max(float(row[j]), 0.0)
+            best_match_orig = truth_origs[j] if max_similarity > 0.0 else None
         
-        # 添加调试日志
-        logging.debug(f"  Matching '{pred_orig}' against ground truth...")
+            # 添加调试日志
+            logging.debug("  Best %s match for '%s': '%s' (score: %.2f)",
+                          'LLM' if use_lm_scores else 'String', pred_orig, best_match_orig, max_similarity)
         
-        for truth_norm, truth_orig in unmatched_truth:
-            # 使用原始名称判断是否已匹配（避免标准化后名称重复的问题）
-            if truth_orig in matched_truth:
-                continue
-            
-            # 首先尝试使用LLM进行语义相似度判断（如果启用）
-            if use_lm_semantic and lm is not None:
-                similarity = check_eif_semantic_similarity(pred_orig, truth_orig, lm, use_lm=True)
-                logging.debug(f"    LLM similarity with '{truth_orig}': {similarity:.2f}")
+            # 如果相似度大于阈值，认为是部分匹配
+            if max_similarity > 0.7 and truth_norms[j]:  # 提高阈值到0.7（LLM更准确）
+                fuzzy_score += max_similarity
+                # 使用原始名称判断是否已匹配（避免标准化后名称重复的问题），同名的真实名称一并标记
+                truth_used |= truth_origs == best_match_orig
+                match_details.append(f"{pred_orig} <-> {best_match_orig} ({max_similarity:.2f})")
+                logging.info("  ✓ Matched: %s", match_details[-1])
             else:
-                # 回退到字符串相似度
-                similarity = _string_similarity(pred_norm, truth_norm)
-                logging.debug(f"    String similarity with '{truth_orig}': {similarity:.2f}")
-            
-            if similarity > max_similarity:
-                max_similarity = similarity
-                best_match = truth_norm
-                best_match_orig = truth_orig
-        
-        # 添加调试日志
-        logging.debug(f"  Best match for '{pred_orig}': '{best_match_orig}' (score: {max_similarity:.2f})")
-        
-        # 如果相似度大于阈值，认为是部分匹配
-        if max_similarity > 0.7 and best_match:  # 提高阈值到0.7（LLM更准确）
-            fuzzy_score += max_similarity
-            matched_truth.add(best_match_orig)  # 使用原始名称而非标准化名称
-            match_details.append(f"{pred_orig} <-> {best_match_orig} ({max_similarity:.2f})")
-            logging.info(f"  ✓ Matched: {pred_orig} <-> {best_match_orig} ({max_similarity:.2f})")
-        else:
-            logging.warning(f"  ✗ No match for '{pred_orig}' (best score: {max_similarity:.2f}, threshold: 0.7)")
+                logging.warning("  ✗ No match for '%s' (best score: %.2f, threshold: 0.7)", pred_orig, max_similarity)
     
     # 总分 = 精确匹配分数 + 模糊匹配分数
     total_matches = exact_matches + fuzzy_score
@@ -225,11 +426,11 @@ def calculate_eif_similarity(predicted: List[str], ground_truth: List[str], lm=N
     else:
         f1_score = 2 * (precision * recall) / (precision + recall)
     
-    logging.info(f"EIF Similarity - Predicted: {predicted}, Truth: {ground_truth}")
-    logging.info(f"  Exact matches: {exact_matches}, Fuzzy score: {fuzzy_score:.2f}")
+    logging.info("EIF Similarity - Predicted: %s, Truth: %s", predicted, ground_truth)
+    logging.info("  Exact matches: %d, Fuzzy score: %.2f", exact_matches, fuzzy_score)
     if match_details:
-        logging.info(f"  Semantic matches: {', '.join(match_details)}")
-    logging.info(f"  Precision: {precision:.2f}, Recall: {recall:.2f}, F1: {f1_score:.2f}")
+        logging.info("  Semantic matches: %s", ', '.join(match_details))
+    logging.info("  Precision: %.2f, Recall: %.2f, F1: %.2f", precision, recall, f1_score)
     
     # 返回详细的评估结果
     return {
@@ -241,6 +442,32 @@ def calculate_eif_similarity(predicted: List[str], ground_truth: List[str], lm=N
         "semantic_matches": match_details
     }
 
+@lru_cache(maxsize=4096)
+def _name_token_sets(name: str) -> Tuple[frozenset, frozenset]:
+    """
+    名称的词集合和字符集合。同一名称会与多个名称比较，因此缓存结果。
+    
+    :param name: 名称
+    :type name: str
+    :return: (按空白分隔的词集合, 字符集合)
+    :rtype: Tuple[frozenset, frozenset]
+    """
+    return frozenset(name.split()), frozenset(name)
+
+def _jaccard(set1: frozenset, set2: frozenset) -> float:
+    """
+    计算两个集合的Jaccard相似度。
+    
+    :param set1: 集合1
+    :type set1: frozenset
+    :param set2: 集合2
+    :type set2: frozenset
+    :return: 相似度 (0.0 - 1.0)
+    :rtype: float
+    """
+    union = len(set1 | set2)
+    return len(set1 & set2) / union if union > 0 else 0.0
+
 def _string_similarity(s1: str, s2: str) -> float:
     """
     计算两个字符串的相似度（基于最长公共子序列）。
@@ -256,18 +483,72 @@ def _string_similarity(s1: str, s2: str) -> float:
         return 0.0
     
     # 简单的基于集合的相似度（Jaccard）
-    set1 = set(s1.split())
-    set2 = set(s2.split())
+    words1, chars1 = _name_token_sets(s1)
+    words2, chars2 = _name_token_sets(s2)
     
-    if not set1 or not set2:
+    if not words1 or not words2:
         # 如果没有空格分隔，使用字符级别
-        set1 = set(s1)
-        set2 = set(s2)
+        return _jaccard(chars1, chars2)
+    return _jaccard(words1, words2)
+
+def _string_similarity_matrix(names1: List[str], names2: List[str]) -> List[List[float]]:
+    """
+    计算两组名称两两之间的字符串相似度，结果与逐对调用 _string_similarity 相同。
     
-    intersection = len(set1 & set2)
-    union = len(set1 | set2)
+    :param names1: 第一组名称
+    :type names1: List[str]
+    :param names2: 第二组名称
+    :type names2: List[str]
+    :return: 相似度矩阵，scores[i][j] 为 names1[i] 与 names2[j] 的相似度 (0.0 - 1.0)
+    :rtype: List[List[float]]
+    """
+    sets1 = [(name,) + _name_token_sets(name) for name in names1]
+    sets2 = [(name,) + _name_token_sets(name) for name in names2]
+    scores = []
+    for name1, words1, chars1 in sets1:
+        row = []
+        for name2, words2, chars2 in sets2:
+            if not name1 or not name2:
+                row.append(0.0)
+            elif words1 and words2:
+                row.append(_jaccard(words1, words2))
+            else:
+                # 如果没有空格分隔，使用字符级别
+                row.append(_jaccard(chars1, chars2))
+        scores.append(row)
+    return scores
+
+def _evaluate_state(state: Dict) -> Dict:
+    """
+    计算状态中最终答案与真实答案的相似度指标。
+    相同的输入只计算一次：状态在操作之间会被复制，且生成新答案时会带上旧的
+    evaluation_metrics，因此按答案内容而不是按状态缓存结果。
+
+    :param state: Thought state to be evaluated.
+    :type state: Dict
+    :return: calculate_eif_similarity 返回的指标字典
+    :rtype: Dict
+    """
+    # 获取预测的EIF功能点列表
+    if "final_answer" in state:
+        prediction = state["final_answer"]  # 现在是列表
+    else:
+        # 向后兼容
+        prediction = []
+    ground_truth = state["ground_truth"]  # 现在也是列表
     
-    return intersection / union if union > 0 else 0.0
+    lm, use_semantic = _scoring_lm()
+    key = (getattr(lm, "model_name", None), use_semantic, tuple(prediction), tuple(ground_truth))
+    similarity_result = _METRICS_CACHE.get(key)
+    if similarity_result is None:
+        # 使用评分LLM进行语义相似度判断
+        similarity_result = calculate_eif_similarity(
+            prediction, ground_truth,
+            lm=lm,
+            use_lm_semantic=use_semantic
+        )
+        _METRICS_CACHE[key] = similarity_result
+    return dict(similarity_result)
 
 def test_eif_assessment(state: Dict) -> bool:
     """
@@ -280,21 +561,8 @@ def test_eif_assessment(state: Dict) -> bool:
     :rtype: bool
     """
     try:
-        # 获取预测的EIF功能点列表
-        if "final_answer" in state:
-            prediction = state["final_answer"]  # 现在是列表
-        else:
-            # 向后兼容
-            prediction = []
-        
-        ground_truth = state["ground_truth"]  # 现在也是列表
-        
-        # 使用全局LLM进行语义相似度判断
-        similarity_result = calculate_eif_similarity(
-            prediction, ground_truth,
-            lm=_GLOBAL_LM_FOR_SCORING,
-            use_lm_semantic=_USE_LLM_SEMANTIC
-        )
+        # 同一答案在 Score 和 GroundTruth 中只评估一次
+        similarity_result = _evaluate_state(state)
         
         # 保存详细指标到state
         state["evaluation_metrics"] = similarity_result
@@ -316,21 +584,8 @@ def score_assessment(state: Dict) -> float:
     :rtype: float
     """
     try:
-        # 获取预测的EIF功能点列表
-        if "final_answer" in state:
-            prediction = state["final_answer"]  # 现在是列表
-        else:
-            # 向后兼容
-            prediction = []
-            
-        ground_truth = state["ground_truth"]  # 现在也是列表
-        
-        # 使用全局LLM进行语义相似度判断
-        similarity_result = calculate_eif_similarity(
-            prediction, ground_truth,
-            lm=_GLOBAL_LM_FOR_SCORING,
-            use_lm_semantic=_USE_LLM_SEMANTIC
-        )
+        # 同一答案在 Score 和 GroundTruth 中只评估一次
+        similarity_result = _evaluate_state(state)
         
         # 保存详细指标到state
         state["evaluation_metrics"] = similarity_result
@@ -600,9 +855,9 @@ IFPUG规则视角分析：
         """
         assert num_branches == 1, "Branching should be done via multiple requests."
         
-        # 添加调试日志
-        logging.debug(f"Method: {method}")
-        logging.debug(f"Current state: {kwargs}")
+        # 添加调试日志（%s 延迟格式化：状态中包含完整需求文档，仅在 DEBUG 级别下才会转成字符串）
+        logging.debug("Method: %s", method)
+        logging.debug("Current state: %s", kwargs)
         
         if method.startswith("io"):
             return self.io_prompt.format(
@@ -624,7 +879,7 @@ IFPUG规则视角分析：
         elif method.startswith("got"):
             # 检查状态中的phase和perspective
             if "phase" in kwargs and kwargs["phase"] == "analysis" and "perspective" in kwargs:
-                logging.debug(f"Using perspective prompt for {kwargs['perspective']}")
+                logging.debug("Using perspective prompt for %s", kwargs['perspective'])
                 return self.perspective_prompt.format(
                     perspective=kwargs["perspective"],
                     requirement_text=kwargs["requirement_text"]
@@ -702,6 +957,59 @@ class FunctionPointParser(parser.Parser):
     Inherits from the Parser class and implements its abstract methods.
     """
 
+    # 以下正则在类加载时编译一次；列表中的模式按优先级排列
+    # 长文本中的最终结论格式
+    final_patterns = tuple(re.compile(pattern, re.DOTALL) for pattern in (
+        r'\*\*最终EIF功能点列表\*\*[：:]\s*\[([^\]]+)\]',
+        r'\*\*最终EIF功能点列表\*\*[：:]\s*([^\n]+)',
+        r'最终EIF功能点列表[：:]\s*\[([^\]]+)\]',
+        r'最终EIF功能点列表[：:]\s*([^\n]+)',
+        # 等价于 r'最终.*?功能点.*?列表...'：从第一个"最终"和其后第一个"功能点"开始匹配，
+        # 避免在多次出现"最终"/"功能点"的文本上回溯成立方复杂度
+        r'\A(?:(?!最终).)*最终(?:(?!功能点).)*功能点.*?列表[：:]\s*\[([^\]]+)\]',
+        r'\*?\*?EIF功能点列表\*?\*?[：:]\s*\[([^\]]+)\]',  # 支持 **EIF功能点列表**：[...]
+        r'EIF功能点列表[：:]\s*([^\n]+)',  # 添加：支持无方括号格式
+    ))
+    # 文本末尾的方括号列表（最后一个）
+    tail_list_pattern = re.compile(r'\[([A-Z][A-Z_,\s]+)\](?!.*\[)', re.DOTALL)
+    # "EIF功能点列表"标题后的编号加粗列表
+    numbered_section_pattern = re.compile(r'EIF功能点列表[：:]\s*\*?\*?\s*\n((?:\d+\.\s*\*\*[^\*]+\*\*[^\n]*\n?)+)', re.DOTALL)
+    numbered_bold_name_pattern = re.compile(r'\d+\.\s*\*\*([A-Z][A-Za-z_\s]+)\*\*')
+    # 不同的答案格式
+    answer_patterns = tuple(re.compile(pattern) for pattern in (
+        r'最终EIF功能点列表[：:]\s*\[([^\]]+)\]',
+        r'最终EIF功能点列表[：:]\s*([^\n（]+)',
+        r'改进后的EIF功能点列表[：:]\s*\[([^\]]+)\]',
+        r'改进后的EIF功能点列表[：:]\s*([^\n（]+)',
+        r'该视角识别的EIF功能点[：:]\s*\[([^\]]+)\]',
+        r'该视角识别的EIF功能点[：:]\s*([^\n（]+)',
+        r'\*?\*?EIF功能点列表\*?\*?[：:]\s*\[([^\]]+)\]',  # 支持 **EIF功能点列表**：[...]
+        r'EIF功能点列表[：:]\s*\[([^\]]+)\]',
+        r'EIF功能点列表[：:]\s*([^\n（]+)',  # 添加：支持无方括号格式（如"EIF功能点列表：无"）
+        r'功能点如下[：:]\s*([^\n]+)',
+        r'功能点[：:]\s*([^\n（]+)',
+    ))
+    # final_patterns 与 answer_patterns 都要求文本中出现该标记
+    answer_marker = '功能点'
+    # 解析的最大文本长度（字符数），超出时只保留末尾部分，限制异常长回答的正则扫描开销
+    max_text_length = 32768
+    # 长文本中优先查找最终结论的末尾窗口大小（字符数）
+    tail_window = 2048
+    separator_pattern = re.compile(r'[,，、;；]')
+    description_patterns = (
+        re.compile(r'根据.*?如下[：:]?\s*'),
+        re.compile(r'识别出.*?如下[：:]?\s*'),
+    )
+    # 加粗编号列表：1. **JOB** - 描述
+    bold_list_pattern = re.compile(r'\d+\.\s*\*\*([A-Z][A-Za-z_\s]+)\*\*\s*[-–—]')
+    eif_section_pattern = re.compile(r'EIF功能点列表[：:](.*?)(?=\n\n|\Z)', re.DOTALL)
+    # 无加粗编号列表：1. JOB - 描述  或  1. JOB（不带描述）
+    plain_list_pattern = re.compile(r'\d+\.\s*([A-Z][A-Z_\s]+?)(?:\s*[-–—]|\s*\n|$)')
+    # 名称清理
+    number_prefix_pattern = re.compile(r'^\d+[\.\)、]\s*')
+    bullet_prefix_pattern = re.compile(r'^[-•·]\s*')
+    bracket_pattern = re.compile(r'[\[\]]')
+
     def extract_answer(self, text: str) -> List[str]:
         """
         从文本中提取EIF功能点列表。
@@ -718,41 +1026,41 @@ class FunctionPointParser(parser.Parser):
             return []
         
         text = text.strip()
+        if len(text) > self.max_text_length:
+            logging.warning(f"Text too long ({len(text)} chars), only parsing the last {self.max_text_length}")
+            text = text[-self.max_text_length:]
+        # 一次子串扫描代替逐条正则：没有"功能点"标记时所有答案模式都不可能命中
+        has_marker = self.answer_marker in text
         
         # 特殊处理：如果是长文本（可能是完整的分析报告），优先查找最终结论
         if len(text) > 500:
             logging.info("Long text detected, searching for final conclusion markers")
             
+            # 提示词要求模型在回答最后给出列表，最终结论几乎总在末尾：
+            # 每个模式先只扫描末尾 tail_window 个字符，找不到时再扫描全文；
+            # 模式循环在外层，保证高优先级模式（带星号加粗）总是先于低优先级模式命中
+            regions = (text,) if len(text) <= self.tail_window else (text[-self.tail_window:], text)
             # 优先匹配带星号加粗的最终结论
-            final_patterns = [
-                r'\*\*最终EIF功能点列表\*\*[：:]\s*\[([^\]]+)\]',
-                r'\*\*最终EIF功能点列表\*\*[：:]\s*([^\n]+)',
-                r'最终EIF功能点列表[：:]\s*\[([^\]]+)\]',
-                r'最终EIF功能点列表[：:]\s*([^\n]+)',
-                r'最终.*?功能点.*?列表[：:]\s*\[([^\]]+)\]',
-                r'\*?\*?EIF功能点列表\*?\*?[：:]\s*\[([^\]]+)\]',  # 支持 **EIF功能点列表**：[...]
-                r'EIF功能点列表[：:]\s*([^\n]+)',  # 添加：支持无方括号格式
-            ]
-            
-            for pattern in final_patterns:
-                match = re.search(pattern, text, re.DOTALL)
-                if match:
-                    eif_text = match.group(1).strip()
-                    logging.info(f"Found final conclusion with pattern: {pattern}")
-                    # 检查是否为"无"
-                    if eif_text in ["无", "无。", "None", "none"]:
-                        logging.info(f"Detected '无' in final conclusion, returning empty list")
-                        return []
-                    eif_list = [self._clean_eif_name(item.strip()) for item in re.split(r'[,，、;；]', eif_text)]
-                    eif_list = [item for item in eif_list if item and len(item) < 50]
-                    if eif_list:
-                        logging.info(f"Extracted EIF from final conclusion: {eif_list}")
-                        return eif_list
+            for pattern in (self.final_patterns if has_marker else ()):
+                for region in regions:
+                    match = pattern.search(region)
+                    if match:
+                        eif_text = match.group(1).strip()
+                        logging.info(f"Found final conclusion with pattern: {pattern.pattern}")
+                        # 检查是否为"无"
+                        if eif_text in ["无", "无。", "None", "none"]:
+                            logging.info(f"Detected '无' in final conclusion, returning empty list")
+                            return []
+                        eif_list = [self._clean_eif_name(item.strip()) for item in self.separator_pattern.split(eif_text)]
+                        eif_list = [item for item in eif_list if item and len(item) < 50]
+                        if eif_list:
+                            logging.info(f"Extracted EIF from final conclusion: {eif_list}")
+                            return eif_list
             
             # 如果没找到"最终"标记，在文本末尾（最后 500 字符）查找列表格式
             text_tail = text[-500:]
             # 查找最后出现的列表格式（优先查找方括号格式）
-            match = re.search(r'\[([A-Z][A-Z_,\s]+)\](?!.*\[)', text_tail, re.DOTALL)
+            match = self.tail_list_pattern.search(text_tail)
             if match:
                 eif_text = match.group(1).strip()
                 logging.info("Found list in text tail")
@@ -764,13 +1072,12 @@ class FunctionPointParser(parser.Parser):
         
         # 首先尝试匹配带编号的列表格式（在"EIF功能点列表"标题后）
         # 格式：**EIF功能点列表：**\n1. **NAME** - 描述
-        eif_list_match = re.search(r'EIF功能点列表[：:]\s*\*?\*?\s*\n((?:\d+\.\s*\*\*[^\*]+\*\*[^\n]*\n?)+)', text, re.DOTALL)
+        eif_list_match = self.numbered_section_pattern.search(text)
         if eif_list_match:
             list_section = eif_list_match.group(1)
             logging.info(f"Found numbered list section after EIF功能点列表")
             # 提取所有加粗的功能点名称
-            pattern = r'\d+\.\s*\*\*([A-Z][A-Za-z_\s]+)\*\*'
-            matches = re.findall(pattern, list_section)
+            matches = self.numbered_bold_name_pattern.findall(list_section)
             if matches:
                 eif_list = [self._clean_eif_name(m.strip()) for m in matches]
                 eif_list = [item for item in eif_list if item and 2 < len(item) < 50]
@@ -779,22 +1086,8 @@ class FunctionPointParser(parser.Parser):
                     return eif_list
         
         # 尝试不同的答案格式模式（按优先级排序）
-        patterns = [
-            r'最终EIF功能点列表[：:]\s*\[([^\]]+)\]',
-            r'最终EIF功能点列表[：:]\s*([^\n（]+)',
-            r'改进后的EIF功能点列表[：:]\s*\[([^\]]+)\]',
-            r'改进后的EIF功能点列表[：:]\s*([^\n（]+)',
-            r'该视角识别的EIF功能点[：:]\s*\[([^\]]+)\]',
-            r'该视角识别的EIF功能点[：:]\s*([^\n（]+)',
-            r'\*?\*?EIF功能点列表\*?\*?[：:]\s*\[([^\]]+)\]',  # 支持 **EIF功能点列表**：[...]
-            r'EIF功能点列表[：:]\s*\[([^\]]+)\]',
-            r'EIF功能点列表[：:]\s*([^\n（]+)',  # 添加：支持无方括号格式（如"EIF功能点列表：无"）
-            r'功能点如下[：:]\s*([^\n]+)',
-            r'功能点[：:]\s*([^\n（]+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text)
+        for pattern in (self.answer_patterns if has_marker else ()):
+            match = pattern.search(text)
             if match:
                 answer_text = match.group(1).strip()
                 # 检查是否为"无"或空 - 如果是，直接返回空列表
@@ -805,7 +1098,7 @@ class FunctionPointParser(parser.Parser):
                 if answer_text in ["", "**", "*"]:
                     continue  # 继续尝试其他模式
                 # 分割功能点（按逗号、顿号或分号）
-                eif_list = re.split(r'[,，、;；]', answer_text)
+                eif_list = self.separator_pattern.split(answer_text)
                 # 清理每个功能点的空白字符和编号
                 eif_list = [self._clean_eif_name(item.strip()) for item in eif_list if item.strip()]
                 # 过滤掉明显不是功能点的项
@@ -818,8 +1111,9 @@ class FunctionPointParser(parser.Parser):
         logging.warning(f"No standard EIF list format found, trying simple comma-separated extraction")
         
         # 去掉明显的描述性文字
-        cleaned_text = re.sub(r'根据.*?如下[：:]?\s*', '', text)
-        cleaned_text = re.sub(r'识别出.*?如下[：:]?\s*', '', cleaned_text)
+        cleaned_text = text
+        for pattern in self.description_patterns:
+            cleaned_text = pattern.sub('', cleaned_text)
         cleaned_text = cleaned_text.strip()
         
         # 检查是否为"无"
@@ -828,7 +1122,7 @@ class FunctionPointParser(parser.Parser):
         
         # 尝试按逗号分割（不按换行符分割，避免将整个文档切碎）
         if ',' in cleaned_text or '，' in cleaned_text:
-            eif_list = re.split(r'[,，、;；]', cleaned_text)
+            eif_list = self.separator_pattern.split(cleaned_text)
             eif_list = [self._clean_eif_name(item.strip()) for item in eif_list if item.strip()]
             # 过滤掉太长的描述性文本（可能不是功能点名称）
             eif_list = [item for item in eif_list if item and len(item) < 50 and len(item) > 0]
@@ -851,8 +1145,7 @@ class FunctionPointParser(parser.Parser):
         # 先尝试加粗格式（优先）- 匹配大写字母或首字母大写+空格的组合
         # 例如：**EMPLOYEE SECURITY** 或 **Employee Security**
         # 改用贪婪匹配，确保能匹配完整的名称
-        pattern = r'\d+\.\s*\*\*([A-Z][A-Za-z_\s]+)\*\*\s*[-–—]'
-        matches = re.findall(pattern, text)
+        matches = self.bold_list_pattern.findall(text)
         if matches:
             eif_list = [self._clean_eif_name(m.strip()) for m in matches]
             # 过滤掉明显不是功能点的（太短或包含"列表"等关键词）
@@ -863,12 +1156,11 @@ class FunctionPointParser(parser.Parser):
                 return eif_list
         
         # 如果没找到，尝试无加粗的编号列表（在"EIF功能点列表"之后）
-        eif_section = re.search(r'EIF功能点列表[：:](.*?)(?=\n\n|\Z)', text, re.DOTALL)
+        eif_section = self.eif_section_pattern.search(text)
         if eif_section:
             section_text = eif_section.group(1)
             # 匹配：1. JOB - 描述  或  1. JOB（不带描述）
-            pattern = r'\d+\.\s*([A-Z][A-Z_\s]+?)(?:\s*[-–—]|\s*\n|$)'
-            matches = re.findall(pattern, section_text)
+            matches = self.plain_list_pattern.findall(section_text)
             if matches:
                 eif_list = [self._clean_eif_name(m.strip()) for m in matches]
                 eif_list = [item for item in eif_list if item and len(item) > 0 and len(item) < 50]
@@ -890,10 +1182,10 @@ class FunctionPointParser(parser.Parser):
         :rtype: str
         """
         # 去除开头的编号（如 "1. "、"- "、"• " 等）
-        name = re.sub(r'^\d+[\.\)、]\s*', '', name)
-        name = re.sub(r'^[-•·]\s*', '', name)
+        name = self.number_prefix_pattern.sub('', name)
+        name = self.bullet_prefix_pattern.sub('', name)
         # 去除方括号
-        name = re.sub(r'[\[\]]', '', name)
+        name = self.bracket_pattern.sub('', name)
         # 去除多余空格
         name = ' '.join(name.split())
         return name
@@ -1119,11 +1411,91 @@ def got() -> operations.GraphOfOperations:
 
     return operations_graph
 
-def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperations]], budget: float, lm_name: str) -> float:
+def _create_lm(lm_name: str) -> language_models.AbstractLanguageModel:
+    """
+    Create the language model used by the experiment jobs.
+
+    :param lm_name: Name of the language model to be used.
+    :type lm_name: str
+    :return: Language model with response caching enabled.
+    :rtype: AbstractLanguageModel
+    """
+    return language_models.ChatGPT(
+        os.path.join(
+            os.path.dirname(__file__),
+            "../../graph_of_thoughts/language_models/config.json",
+        ),
+        model_name=lm_name,
+        cache=True,
+    )
+
+def _run_one(data: List, method: Callable[[], operations.GraphOfOperations], lm_name: str, results_folder: str) -> float:
+    """
+    Run a single method on a single sample and store its graph.
+    Every job gets its own language model, graph and controller, and sets the
+    scoring language model in its own context, so jobs can run on separate
+    threads without sharing state. Independent operations of the graph run
+    concurrently inside the controller. If the graph fails, it is run again;
+    requests that already succeeded are answered from the response cache of
+    the job's language model, so the retry resumes at the failed operation.
+
+    :param data: Sample row [doc_id, true_eif_list, requirement_text].
+    :type data: List
+    :param method: Function that generates the Graph of Operations.
+    :type method: Callable[[], operations.GraphOfOperations]
+    :param lm_name: Name of the language model to be used.
+    :type lm_name: str
+    :param results_folder: Folder of the current run.
+    :type results_folder: str
+    :return: Cost of the job in dollars.
+    :rtype: float
+    """
+    logging.info(f"Running method {method.__name__} on data {data[0]}: Ground truth EIF count {len(data[1])}, Requirement text length {len(data[2])}")
+    lm = _create_lm(lm_name)
+    
+    # 设置用于评分的LLM（可选启用语义相似度判断）
+    # 注意：启用会增加API调用成本，建议在评估阶段使用
+    use_semantic = True  # 设置为True启用LLM语义相似度判断
+    set_scoring_lm(lm, use_semantic=use_semantic)
+    
+    for attempt in range(1, JOB_ATTEMPTS + 1):
+        operations_graph = method()
+        executor = controller.Controller(
+            lm,
+            operations_graph,
+            FunctionPointPrompter(),
+            FunctionPointParser(),
+            {
+                "requirement_text": data[2],  # 需求文档 (data[1])
+                "ground_truth": data[1],  # EIF功能点列表 (data[2])
+                "current": "",
+                "method": method.__name__,
+            },
+            max_workers=OPERATION_WORKERS,
+        )
+        try:
+            executor.run()
+            break
+        except Exception as e:
+            logging.error(f"Exception (attempt {attempt}/{JOB_ATTEMPTS}): {e}")
+    path = os.path.join(
+        results_folder,
+        method.__name__,
+        f"{data[0]}.json",
+    )
+    executor.output_graph(path)
+    return lm.cost
+
+def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperations]], budget: float, lm_name: str,
+        max_workers: int = 8) -> float:
     """
     Controller function that executes each specified method for each specified
     sample while the budget is not exhausted.
 
+    The sample/method jobs are I/O bound on the language model, so they run
+    concurrently on a thread pool. The budget is checked before each job
+    starts, so jobs already in flight may overshoot it slightly.
+
     :param data_ids: Indices of the sample to be run.
     :type data_ids: List[int]
     :param methods: List of functions to generate Graphs of Operations.
@@ -1132,31 +1504,28 @@ def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperat
     :type budget: float
     :param lm_name: Name of the language model to be used.
     :type lm_name: str
+    :param max_workers: Maximum number of jobs running at the same time. Defaults to 8.
+    :type max_workers: int
     :return: Spent budget in dollars.
     :rtype: float
     """
-    orig_budget = budget
     data_path = os.path.join(os.path.dirname(__file__), "eif_selection.csv")
+    # 新格式: doc_id, true_eif, requirement_text
+    # true_eif 是逗号分隔的EIF功能点列表；所有列按字符串读取，由 C 解析器一次解析整个文件
+    df = pd.read_csv(data_path, encoding="gbk", dtype=str, keep_default_na=False, engine="c")  # 使用 GBK 编码（文件实际编码）
+    true_eif_strs = df.iloc[:, 1].str.strip()
+    true_eif_items = true_eif_strs.str.split(r'[,，]', regex=True)
     data = []
-    with open(data_path, "r", encoding="gbk") as f:  # 使用 GBK 编码（文件实际编码）
-        reader = csv.reader(f)
-        next(reader)  # Skip header
-        for row in reader:
-            # 新格式: doc_id, true_eif, requirement_text
-            # true_eif 是逗号分隔的EIF功能点列表
-            doc_id = int(row[0])
-            true_eif_str = row[1].strip()
-            requirement_text = row[2]
-            
-            # 将true_eif字符串解析为列表
-            if true_eif_str and true_eif_str.lower() not in ["无", "none", ""]:
-                true_eif_list = [item.strip() for item in re.split(r'[,，]', true_eif_str) if item.strip()]
-            else:
-                true_eif_list = []
-            
-            # 注意：data结构为 [doc_id, true_eif_list, requirement_text]
-            # 这样data[1]就是功能点列表，data[2]就是需求文档
-            data.append([doc_id, true_eif_list, requirement_text])
+    for doc_id, true_eif_str, items, requirement_text in zip(df.iloc[:, 0], true_eif_strs, true_eif_items, df.iloc[:, 2]):
+        # 将true_eif字符串解析为列表
+        if true_eif_str and true_eif_str.lower() not in ["无", "none", ""]:
+            true_eif_list = [item.strip() for item in items if item.strip()]
+        else:
+            true_eif_list = []
+        
+        # 注意：data结构为 [doc_id, true_eif_list, requirement_text]
+        # 这样data[1]就是功能点列表，data[2]就是需求文档
+        data.append([int(doc_id), true_eif_list, requirement_text])
 
     if data_ids is None or len(data_ids) == 0:
         data_ids = list(range(len(data)))
@@ -1181,70 +1550,54 @@ def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperat
     with open(os.path.join(results_folder, "config.json"), "w", encoding="utf-8") as f:
         json.dump(config, f, ensure_ascii=False, indent=2)
 
-    logging.basicConfig(
-        filename=os.path.join(results_folder, "log.log"),
-        filemode="w",
-        format="%(name)s - %(levelname)s - %(message)s",
-        level=logging.DEBUG,
-        encoding="utf-8"
-    )
+    # 工作线程只把日志记录放入队列，由单独的监听线程写入文件
+    file_handler = logging.FileHandler(os.path.join(results_folder, "log.log"), mode="w", encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter("%(name)s - %(levelname)s - %(message)s"))
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    root_logger = logging.getLogger()
+    if not root_logger.handlers:
+        root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(queue_handler)
+    listener.start()
 
     for method in methods:
         # create a results directory for the method
         os.makedirs(os.path.join(results_folder, method.__name__))
 
-    for data in selected_data:
-        logging.info(f"Running data {data[0]}: Ground truth EIF count {len(data[1])}, Requirement text length {len(data[2])}")
-        if budget <= 0.0:
-            logging.error(f"Budget has been depleted, stopping. Data {data[0]} has not been run.")
-            break
-        for method in methods:
-            logging.info(f"Running method {method.__name__}")
-            logging.info(f"Budget left: {budget}")
-            if budget <= 0.0:
-                logging.error(f"Budget has been depleted, stopping. Method {method.__name__} has not been run.")
-                break
-
-            lm = language_models.ChatGPT(
-                os.path.join(
-                    os.path.dirname(__file__),
-                    "../../graph_of_thoughts/language_models/config.json",
-                ),
-                model_name=lm_name,
-                cache=True,
-            )
-            
-            # 设置用于评分的LLM（可选启用语义相似度判断）
-            # 注意：启用会增加API调用成本，建议在评估阶段使用
-            use_semantic = True  # 设置为True启用LLM语义相似度判断
-            set_scoring_lm(lm, use_semantic=use_semantic)
-            
-            operations_graph = method()
-            executor = controller.Controller(
-                lm,
-                operations_graph,
-                FunctionPointPrompter(),
-                FunctionPointParser(),
-                {
-                    "requirement_text": data[2],  # 需求文档 (data[1])
-                    "ground_truth": data[1],  # EIF功能点列表 (data[2])
-                    "current": "",
-                    "method": method.__name__,
-                },
-            )
-            try:
-                executor.run()
-            except Exception as e:
-                logging.error(f"Exception: {e}")
-            path = os.path.join(
-                results_folder,
-                method.__name__,
-                f"{data[0]}.json",
-            )
-            executor.output_graph(path)
-            budget -= lm.cost
+    # 预算在多个线程之间共享，需要加锁
+    budget_lock = threading.Lock()
+    spent = 0.0
+    cache_stats_before = dict(_SIM_CACHE_STATS)
+
+    def job(data, method):
+        nonlocal spent
+        with budget_lock:
+            if budget - spent <= 0.0:
+                logging.error(f"Budget has been depleted, stopping. Method {method.__name__} has not been run on data {data[0]}.")
+                return
+            logging.info(f"Budget left: {budget - spent}")
+        cost = _run_one(data, method, lm_name, results_folder)
+        with budget_lock:
+            spent += cost
 
-    return orig_budget - budget
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(job, data, method) for data in selected_data for method in methods]
+            for future in futures:
+                future.result()
+
+        hits = _SIM_CACHE_STATS["hits"] - cache_stats_before["hits"]
+        misses = _SIM_CACHE_STATS["misses"] - cache_stats_before["misses"]
+        if hits + misses:
+            logging.info(f"Similarity cache: {hits} hits, {misses} misses ({hits / (hits + misses):.1%} hit rate)")
+    finally:
+        root_logger.removeHandler(queue_handler)
+        listener.stop()
+        file_handler.close()
+
+    return spent
 
 if __name__ == "__main__":
     """
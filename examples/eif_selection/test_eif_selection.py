@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from eif_selection import FunctionPointParser
+
+
+def test_final_pattern_priority_beyond_tail_window():
+    # 加粗的最终结论在末尾窗口之外，末尾只有低优先级的"EIF功能点列表"，
+    # 仍应返回加粗最终结论中的列表
+    text = (
+        "**最终EIF功能点列表：[用户信息, 订单数据]**\n"
+        + "分析说明。" * 700
+        + "\n系统视角 EIF功能点列表：[日志表]\n"
+    )
+    assert len(text) > FunctionPointParser.tail_window
+    assert FunctionPointParser().extract_answer(text) == ["用户信息", "订单数据"]
+
+
+def test_final_conclusion_in_tail():
+    text = "分析说明。" * 700 + "\n**最终EIF功能点列表**：[用户信息]\n"
+    assert FunctionPointParser().extract_answer(text) == ["用户信息"]
@@ -12,10 +12,18 @@ import datetime
 import json
 import csv
 import re
+import hashlib
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial, total_ordering
 from typing import Dict, List, Callable, Union
+import graph_of_thoughts
 from graph_of_thoughts import controller, language_models, operations, prompter, parser
 
+# 同一个图中可同时执行的独立操作数（got 的三个视角分支）
+OPERATION_WORKERS = 3
+
 def test_ilf_assessment(state: Dict) -> bool:
     """
     Function to test whether the final solution matches ground truth.
@@ -60,6 +68,21 @@ def score_assessment(state: Dict) -> float:
     except:
         return 0.0
 
+def continue_unless_solved(thoughts: List[operations.Thought]) -> List[operations.Thought]:
+    """
+    Function to stop the ToT refinement once the kept thought has the full score.
+    Later rounds can only keep a thought that scores at least as well, so they
+    cannot change the outcome and their language model calls are skipped.
+
+    :param thoughts: Thoughts kept by the previous round.
+    :type thoughts: List[Thought]
+    :return: The thoughts to refine in the next round, none if the best one is already solved.
+    :rtype: List[Thought]
+    """
+    if any(thought.scored and thought.score >= 1.0 for thought in thoughts):
+        return []
+    return thoughts
+
 class FunctionPointPrompter(prompter.Prompter):
     """
     FunctionPointPrompter provides the generation of prompts specific to the
@@ -68,16 +91,22 @@ class FunctionPointPrompter(prompter.Prompter):
     Inherits from the Prompter class and implements its abstract methods.
     """
 
-    io_prompt = """你是一个IFPUG功能点分析专家。请判断给定的功能点是否构成内部逻辑文件（ILF）。
-只需回答"是"或"否"。
+    # 所有提示词共用同一个前缀（角色 + 需求文档），候选功能点等易变内容放在末尾，
+    # 以便同一文档的多次请求能命中服务端的前缀缓存（prompt caching）。
+    context_prompt = """你是一个IFPUG功能点分析专家。
 
 [需求文档]
 {requirement_text}
 
+"""
+
+    io_prompt = context_prompt + """请判断给定的功能点是否构成内部逻辑文件（ILF）。
+只需回答"是"或"否"。
+
 [候选功能点]
 名称：{candidate_name}"""
 
-    cot_prompt = """你是一个IFPUG功能点分析专家。请判断给定的功能点是否构成内部逻辑文件（ILF）。
+    cot_prompt = context_prompt + """请判断给定的功能点是否构成内部逻辑文件（ILF）。
 请按照以下步骤进行分析：
 
 1. 首先，判断是否是用户可识别的逻辑相关数据组
@@ -85,12 +114,6 @@ class FunctionPointPrompter(prompter.Prompter):
 3. 最后，判断是否通过应用的基本流程维护
 4. 根据以上分析，得出最终结论
 
-[需求文档]
-{requirement_text}
-
-[候选功能点]
-名称：{candidate_name}
-
 请按以下格式输出：
 思考过程：
 1. [分析第一个条件]
@@ -98,15 +121,12 @@ class FunctionPointPrompter(prompter.Prompter):
 3. [分析第三个条件]
 4. [得出结论]
 
-最终答案：[是/否]"""
-
-    tot_prompt = """你是一个IFPUG功能点分析专家。请判断给定的功能点是否构成内部逻辑文件（ILF）。
-
-[需求文档]
-{requirement_text}
+最终答案：[是/否]
 
 [候选功能点]
-名称：{candidate_name}
+名称：{candidate_name}"""
+
+    tot_prompt = context_prompt + """请判断给定的功能点是否构成内部逻辑文件（ILF）。
 
 请按以下方法分析候选功能点是否为ILF功能点：
 
@@ -127,15 +147,12 @@ class FunctionPointPrompter(prompter.Prompter):
    3.2 [验证是否有遗漏]
 
 4. 最终结论
-   [是/否]"""
-
-    got_prompt = """你是一个IFPUG功能点分析专家。请判断给定的功能点是否构成内部逻辑文件（ILF）。
-
-[需求文档]
-{requirement_text}
+   [是/否]
 
 [候选功能点]
-名称：{candidate_name}
+名称：{candidate_name}"""
+
+    got_prompt = context_prompt + """请判断给定的功能点是否构成内部逻辑文件（ILF）。
 
 请按以下步骤分析：
 
@@ -162,34 +179,27 @@ class FunctionPointPrompter(prompter.Prompter):
 - 处理可能的冲突
 - 得出最终判断
 
-最终答案：[是/否]"""
-
-    tot_improve_prompt = """你是一个IFPUG功能点分析专家。基于之前的分析结果进行改进：
-
-之前的判断：{current}
-
-[需求文档]
-{requirement_text}
+最终答案：[是/否]
 
 [候选功能点]
-名称：{candidate_name}
+名称：{candidate_name}"""
 
-请基于之前的判断进行改进：
+    tot_improve_prompt = context_prompt + """请判断给定的功能点是否构成内部逻辑文件（ILF）。基于之前的分析结果进行改进：
 1. 分析之前判断的优点
 2. 找出可能的问题或遗漏
 3. 提出改进的思路
 4. 给出改进后的判断
 
-最终答案：[是/否]"""
-
-    perspective_prompt = """你是一个IFPUG功能点分析专家。请从{perspective}分析此功能点是否构成ILF。
-
-[需求文档]
-{requirement_text}
+最终答案：[是/否]
 
 [候选功能点]
 名称：{candidate_name}
 
+[之前的判断]
+{current}"""
+
+    perspective_prompt = context_prompt + """请从指定的分析视角分析此功能点是否构成ILF。
+
 [分析视角说明]
 用户视角 - 关注：
 - 数据组是否满足完整的业务需求（不能只满足部分需求）
@@ -229,25 +239,15 @@ IFPUG规则视角 - 关注：
 5. 结论：
    [总结性分析]
 
-该视角的判断：[是/否]"""
-
-    merge_prompt = """你是一个IFPUG功能点分析专家。请综合以下三个视角的分析结果，判断此功能点是否构成ILF。
-
-[需求文档]
-{requirement_text}
+该视角的判断：[是/否]
 
 [候选功能点]
 名称：{candidate_name}
 
-[各视角分析结果]
-用户视角分析：
-{user_perspective}
-
-系统视角分析：
-{system_perspective}
+[分析视角]
+{perspective}"""
 
-IFPUG规则视角分析：
-{ifpug_perspective}
+    merge_prompt = context_prompt + """请综合三个视角的分析结果，判断此功能点是否构成ILF。
 
 [分析要求]
 1. 必须同时满足以下所有条件才能判定为ILF：
@@ -289,7 +289,20 @@ IFPUG规则视角分析：
 4. 综合分析：
    [详细的权衡分析]
 
-最终判断：[是/否]"""
+最终判断：[是/否]
+
+[候选功能点]
+名称：{candidate_name}
+
+[各视角分析结果]
+用户视角分析：
+{user_perspective}
+
+系统视角分析：
+{system_perspective}
+
+IFPUG规则视角分析：
+{ifpug_perspective}"""
 
     def generate_prompt(self, num_branches: int, current: str, method: str, **kwargs) -> str:
         """
@@ -308,9 +321,9 @@ IFPUG规则视角分析：
         """
         assert num_branches == 1, "Branching should be done via multiple requests."
         
-        # 添加调试日志
-        logging.debug(f"Method: {method}")
-        logging.debug(f"Current state: {kwargs}")
+        # 添加调试日志（%s 延迟格式化：状态中包含完整需求文档，仅在 DEBUG 级别下才会转成字符串）
+        logging.debug("Method: %s", method)
+        logging.debug("Current state: %s", kwargs)
         
         if method.startswith("io"):
             return self.io_prompt.format(
@@ -336,7 +349,7 @@ IFPUG规则视角分析：
         elif method.startswith("got"):
             # 检查状态中的phase和perspective
             if "phase" in kwargs and kwargs["phase"] == "analysis" and "perspective" in kwargs:
-                logging.debug(f"Using perspective prompt for {kwargs['perspective']}")
+                logging.debug("Using perspective prompt for %s", kwargs['perspective'])
                 return self.perspective_prompt.format(
                     perspective=kwargs["perspective"],
                     requirement_text=kwargs["requirement_text"],
@@ -417,6 +430,22 @@ class FunctionPointParser(parser.Parser):
     Inherits from the Parser class and implements its abstract methods.
     """
 
+    # 不同的答案格式，按优先级排列；第一个捕获组即为"是"或"否"。
+    # 优先级依赖于顺序，因此不能合并为一个正则（交替只会选最靠前的位置）。
+    answer_patterns = tuple(re.compile(pattern) for pattern in (
+        r'最终判断：\[(是)/否\]',  # 标准格式
+        r'最终判断：.*?(是|否)',  # 带任意字符的格式
+        r'该视角的判断：\[(是)/否\]',  # 视角分析格式
+        r'该视角的判断：.*?(是|否)',  # 带任意字符的视角分析格式
+        r'最终答案：\[(是)/否\]',  # 另一种标准格式
+        r'最终答案：.*?(是|否)',  # 带任意字符的另一种格式
+        r'判断：.*?(是|否)',  # 简单格式
+        r'结论：.*?(是|否)',  # 结论格式
+        r'\*\*(是|否)\*\*',  # Markdown加粗格式
+        r'最终判断：\*\*(是|否)\*\*',  # 带加粗的最终判断格式
+        r'(是|否)'  # 最简单的格式（最后尝试）
+    ))
+
     def extract_answer(self, text: str) -> str:
         """
         从文本中提取答案（是/否）。
@@ -426,31 +455,13 @@ class FunctionPointParser(parser.Parser):
         :return: 提取出的答案（是/否）
         :rtype: str
         """
-        # 尝试不同的答案格式
-        patterns = [
-            r'最终判断：\[是/否\]',  # 标准格式
-            r'最终判断：.*?(?:是|否)',  # 带任意字符的格式
-            r'该视角的判断：\[是/否\]',  # 视角分析格式
-            r'该视角的判断：.*?(?:是|否)',  # 带任意字符的视角分析格式
-            r'最终答案：\[是/否\]',  # 另一种标准格式
-            r'最终答案：.*?(?:是|否)',  # 带任意字符的另一种格式
-            r'判断：.*?(?:是|否)',  # 简单格式
-            r'结论：.*?(?:是|否)',  # 结论格式
-            r'\*\*(?:是|否)\*\*',  # Markdown加粗格式
-            r'最终判断：\*\*(?:是|否)\*\*',  # 带加粗的最终判断格式
-            r'(?:是|否)'  # 最简单的格式（最后尝试）
-        ]
-        
         # 去除所有换行符，便于匹配
         text = text.replace('\n', ' ')
         
-        for pattern in patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                # 提取匹配文本中的"是"或"否"
-                answer = re.search(r'(?:是|否)', match.group())
-                if answer:
-                    return answer.group()
+        for pattern in self.answer_patterns:
+            match = pattern.search(text)
+            if match:
+                return match.group(1)
         
         # 如果没有找到任何匹配，返回默认值
         logging.warning(f"No answer found in text: {text}")
@@ -465,12 +476,13 @@ class FunctionPointParser(parser.Parser):
         :param texts: The responses to the prompt from the language model.
         :type texts: List[str]
         :return: The new thought states after parsing the responses from the language model.
+                 Only the keys that change are returned; Generate merges them into the base state.
         :rtype: List[Dict]
         """
         new_states = []
         for text in texts:
             try:
-                new_state = state.copy()
+                new_state = {}
                 
                 # 保存原始回答
                 new_state["current"] = text
@@ -499,7 +511,7 @@ class FunctionPointParser(parser.Parser):
             except Exception as e:
                 logging.error(f"Could not parse answer: {text}. Error: {e}")
                 # 发生错误时添加一个默认状态
-                default_state = state.copy()
+                default_state = {}
                 default_state["current"] = text
                 default_state["final_answer"] = False  # 默认为否
                 default_state["parse_error"] = str(e)
@@ -604,6 +616,8 @@ def tot() -> operations.GraphOfOperations:
     operations_graph.append_operation(keep_best_1)
 
     for _ in range(3):
+        # 上一轮保留的思路已得满分时不再生成，本轮的生成和评分直接跳过
+        operations_graph.append_operation(operations.Selector(continue_unless_solved))
         operations_graph.append_operation(operations.Generate(1, 1))
         operations_graph.append_operation(operations.Score(1, False, score_assessment))
         keep_best_2 = operations.KeepBestN(1, True)  # True: 选择最高分数
@@ -677,11 +691,149 @@ def got() -> operations.GraphOfOperations:
 
     return operations_graph
 
-def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperations]], budget: float, lm_name: str) -> float:
+# 语言模型配置文件
+LM_CONFIG_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "../../graph_of_thoughts/language_models/config.json",
+)
+
+def _create_lm(lm_name: str) -> language_models.AbstractLanguageModel:
+    """
+    Create the language model used by the experiment jobs.
+
+    :param lm_name: Name of the language model to be used.
+    :type lm_name: str
+    :return: Language model with response caching enabled.
+    :rtype: AbstractLanguageModel
+    """
+    return language_models.ChatGPT(
+        LM_CONFIG_PATH,
+        model_name=lm_name,
+        cache=True,
+    )
+
+def _run_one(data: List, method: Callable[[], operations.GraphOfOperations], lm_name: str, results_folder: str) -> float:
+    """
+    Run a single method on a single sample and store its graph.
+
+    Every job gets its own language model, graph and controller, so jobs can
+    run on separate threads without sharing state.
+
+    :param data: Sample row [id, candidate_name, requirement_text, ground_truth].
+    :type data: List
+    :param method: Function that generates the Graph of Operations.
+    :type method: Callable[[], operations.GraphOfOperations]
+    :param lm_name: Name of the language model to be used.
+    :type lm_name: str
+    :param results_folder: Folder of the current run.
+    :type results_folder: str
+    :return: Cost of the job in dollars.
+    :rtype: float
+    """
+    logging.info(f"Running method {method.__name__} on data {data[0]}: {data[1]}")
+    lm = _create_lm(lm_name)
+    operations_graph = method()
+    executor = controller.Controller(
+        lm,
+        operations_graph,
+        FunctionPointPrompter(),
+        FunctionPointParser(),
+        {
+            "requirement_text": data[2],
+            "candidate_name": data[1],
+            "ground_truth": data[3],
+            "current": "",
+            "method": method.__name__,
+        },
+        max_workers=OPERATION_WORKERS,
+    )
+    try:
+        executor.run()
+    except Exception as e:
+        logging.error(f"Exception: {e}")
+    path = os.path.join(
+        results_folder,
+        method.__name__,
+        f"{data[0]}.json",
+    )
+    executor.output_graph(path)
+    return lm.cost
+
+
+def _fingerprint(method_name: str, data: List, lm_settings: str) -> str:
+    """
+    Fingerprint of everything that determines the result of a job apart from the code.
+
+    :param method_name: Name of the method.
+    :type method_name: str
+    :param data: Sample row [id, candidate_name, requirement_text, ground_truth].
+    :type data: List
+    :param lm_settings: Endpoint, model id and sampling settings of the language model.
+    :type lm_settings: str
+    :return: Hex digest of the job inputs.
+    :rtype: str
+    """
+    key = f"{method_name}|{lm_settings}|{data[1]}|{data[2]}|{data[3]}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+def _source_mtime() -> float:
+    """
+    Latest modification time of the code and configuration that produce a result:
+    本文件（提示词和图的定义）、语言模型配置文件以及 graph_of_thoughts 包的源码。
+
+    :return: Modification time in seconds since the epoch.
+    :rtype: float
+    """
+    mtimes = [os.path.getmtime(__file__), os.path.getmtime(LM_CONFIG_PATH)]
+    for root, _, files in os.walk(os.path.dirname(graph_of_thoughts.__file__)):
+        mtimes.extend(os.path.getmtime(os.path.join(root, name)) for name in files if name.endswith(".py"))
+    return max(mtimes)
+
+def _previous_results(results_dir: str, lm_name: str) -> Dict[str, str]:
+    """
+    Collect the result files of earlier runs with the same language model, keyed by job fingerprint.
+    只保留比产生结果的代码和配置（见 _source_mtime）更新的结果。
+
+    :param results_dir: Directory that holds the run folders.
+    :type results_dir: str
+    :param lm_name: Name of the language model.
+    :type lm_name: str
+    :return: Mapping from fingerprint to result file.
+    :rtype: Dict[str, str]
+    """
+    source_mtime = _source_mtime()
+    found = {}
+    with os.scandir(results_dir) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            try:
+                with open(os.path.join(entry.path, "config.json"), "r", encoding="utf-8") as f:
+                    config = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if config.get("lm") != lm_name:
+                continue
+            for method_name, fingerprints in config.get("fingerprints", {}).items():
+                for data_id, fingerprint in fingerprints.items():
+                    path = os.path.join(entry.path, method_name, f"{data_id}.json")
+                    try:
+                        if os.path.getmtime(path) > source_mtime:
+                            found[fingerprint] = path
+                    except OSError:
+                        continue
+    return found
+
+def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperations]], budget: float, lm_name: str, max_workers: int = 8,
+        reuse_results: bool = False) -> float:
     """
     Controller function that executes each specified method for each specified
     sample while the budget is not exhausted.
 
+    The sample/method jobs are I/O bound on the language model, so they run
+    concurrently on a thread pool. The budget is checked before each job
+    starts, so jobs already in flight may overshoot it slightly.
+
     :param data_ids: Indices of the sample to be run.
     :type data_ids: List[int]
     :param methods: List of functions to generate Graphs of Operations.
@@ -690,26 +842,43 @@ def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperat
     :type budget: float
     :param lm_name: Name of the language model to be used.
     :type lm_name: str
+    :param max_workers: Maximum number of jobs running at the same time. Defaults to 8.
+    :type max_workers: int
+    :param reuse_results: Whether jobs whose inputs match a result of an earlier run with the same
+                          language model copy that result instead of running again. Defaults to False.
+    :type reuse_results: bool
     :return: Spent budget in dollars.
     :rtype: float
     """
-    orig_budget = budget
     data_path = os.path.join(os.path.dirname(__file__), "ilf_samples.csv")
-    data = []
+    # 只解析被选中的样本行；全部找到后即停止读取
+    wanted = set(data_ids) if data_ids else None
+    rows = {}
     with open(data_path, "r", encoding="gbk") as f:  # 使用 GBK 编码
         reader = csv.reader(f)
         next(reader)  # Skip header
-        for row in reader:
-            data.append([int(row[0]), row[1], row[2], row[3] == "TRUE"])
+        for i, row in enumerate(reader):
+            if wanted is None or i in wanted:
+                rows[i] = [int(row[0]), row[1], row[2], row[3] == "TRUE"]
+                if wanted is not None and len(rows) == len(wanted):
+                    break
 
     if data_ids is None or len(data_ids) == 0:
-        data_ids = list(range(len(data)))
-    selected_data = [data[i] for i in data_ids]
+        data_ids = list(rows)
+    selected_data = [rows[i] for i in data_ids]
 
     results_dir = os.path.join(os.path.dirname(__file__), "results")
 
     if not os.path.exists(results_dir):
         os.makedirs(results_dir)
+    previous_results = _previous_results(results_dir, lm_name) if reuse_results else {}
+
+    lm_settings = _create_lm(lm_name).settings
+    fingerprints = {
+        method.__name__: {data[0]: _fingerprint(method.__name__, data, lm_settings) for data in selected_data}
+        for method in methods
+    }
+
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     extra_info = f"{lm_name}_{'-'.join([method.__name__ for method in methods])}"
     folder_name = f"{extra_info}_{timestamp}"
@@ -721,9 +890,13 @@ def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperat
         "methods": [method.__name__ for method in methods],
         "lm": lm_name,
         "budget": budget,
+        "fingerprints": fingerprints,
     }
-    with open(os.path.join(results_folder, "config.json"), "w", encoding="utf-8") as f:
+    # 先写临时文件再替换，其他进程（如复用结果时）不会读到写了一半的配置
+    config_path = os.path.join(results_folder, "config.json")
+    with open(f"{config_path}.tmp", "w", encoding="utf-8") as f:
         json.dump(config, f, ensure_ascii=False, indent=2)
+    os.replace(f"{config_path}.tmp", config_path)
 
     logging.basicConfig(
         filename=os.path.join(results_folder, "log.log"),
@@ -737,53 +910,32 @@ def run(data_ids: List[int], methods: List[Callable[[], operations.GraphOfOperat
         # create a results directory for the method
         os.makedirs(os.path.join(results_folder, method.__name__))
 
-    for data in selected_data:
-        logging.info(f"Running data {data[0]}: {data[1]}")
-        if budget <= 0.0:
-            logging.error(f"Budget has been depleted, stopping. Data {data[0]} has not been run.")
-            break
-        for method in methods:
-            logging.info(f"Running method {method.__name__}")
-            logging.info(f"Budget left: {budget}")
-            if budget <= 0.0:
-                logging.error(f"Budget has been depleted, stopping. Method {method.__name__} has not been run.")
-                break
-
-            lm = language_models.ChatGPT(
-                os.path.join(
-                    os.path.dirname(__file__),
-                    "../../graph_of_thoughts/language_models/config.json",
-                ),
-                model_name=lm_name,
-                cache=True,
-            )
-            operations_graph = method()
-            executor = controller.Controller(
-                lm,
-                operations_graph,
-                FunctionPointPrompter(),
-                FunctionPointParser(),
-                {
-                    "requirement_text": data[2],
-                    "candidate_name": data[1],
-                    "ground_truth": data[3],
-                    "current": "",
-                    "method": method.__name__,
-                },
-            )
-            try:
-                executor.run()
-            except Exception as e:
-                logging.error(f"Exception: {e}")
-            path = os.path.join(
-                results_folder,
-                method.__name__,
-                f"{data[0]}.json",
-            )
-            executor.output_graph(path)
-            budget -= lm.cost
-
-    return orig_budget - budget
+    # 预算在多个线程之间共享，需要加锁
+    budget_lock = threading.Lock()
+    spent = 0.0
+
+    def job(data, method):
+        nonlocal spent
+        previous = previous_results.get(fingerprints[method.__name__][data[0]])
+        if previous is not None:
+            logging.info(f"Reusing {previous} for method {method.__name__} on data {data[0]}")
+            shutil.copyfile(previous, os.path.join(results_folder, method.__name__, f"{data[0]}.json"))
+            return
+        with budget_lock:
+            if budget - spent <= 0.0:
+                logging.error(f"Budget has been depleted, stopping. Method {method.__name__} has not been run on data {data[0]}.")
+                return
+            logging.info(f"Budget left: {budget - spent}")
+        cost = _run_one(data, method, lm_name, results_folder)
+        with budget_lock:
+            spent += cost
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(job, data, method) for data in selected_data for method in methods]
+        for future in futures:
+            future.result()
+
+    return spent
 
 if __name__ == "__main__":
     """
@@ -3,9 +3,33 @@
 
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 同时读取结果文件的线程数（文件小而多，耗时主要在打开和读取上）
+READ_WORKERS = 16
+
+def _load(path: str) -> Any:
+    """
+    读取并解析一个JSON文件，安装了orjson时使用orjson。
+
+    :param path: 文件路径
+    :type path: str
+    :return: 解析后的数据
+    :rtype: Any
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 def load_results(results_dir: str) -> List[Dict[str, Any]]:
     """
@@ -16,103 +40,133 @@ def load_results(results_dir: str) -> List[Dict[str, Any]]:
     :return: 结果数据列表
     :rtype: List[Dict[str, Any]]
     """
+    # 先列出所有结果文件，再在线程池中并行读取
+    # scandir 的目录项自带类型信息，不必再逐个 stat；不存在的文件和目录直接在打开时跳过
+    jobs = []  # [(文件路径, 方法, 模型)]
+    with os.scandir(results_dir) as folders:
+        for folder in folders:
+            if not folder.is_dir():
+                continue
+            try:
+                config = _load(os.path.join(folder.path, "config.json"))
+            except FileNotFoundError:
+                continue
+            
+            # 遍历方法目录
+            for method in config["methods"]:
+                try:
+                    with os.scandir(os.path.join(folder.path, method)) as result_files:
+                        for result_file in result_files:
+                            if result_file.name.endswith(".json") and result_file.is_file():
+                                jobs.append((result_file.path, method, config["lm"]))
+                except FileNotFoundError:
+                    continue
+    
+    # 读取每个样本的结果（按列出的顺序返回）
     results = []
-    for folder in os.listdir(results_dir):
-        folder_path = os.path.join(results_dir, folder)
-        if os.path.isdir(folder_path):
-            config_path = os.path.join(folder_path, "config.json")
-            if os.path.exists(config_path):
-                with open(config_path, "r") as f:
-                    config = json.load(f)
-                
-                # 遍历方法目录
-                for method in config["methods"]:
-                    method_path = os.path.join(folder_path, method)
-                    if os.path.exists(method_path):
-                        # 读取每个样本的结果
-                        for result_file in os.listdir(method_path):
-                            if result_file.endswith(".json"):
-                                with open(os.path.join(method_path, result_file), "r") as f:
-                                    result = json.load(f)
-                                    result["method"] = method
-                                    result["lm"] = config["lm"]
-                                    results.append(result)
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        for (path, method, lm), result in zip(jobs, pool.map(_load, [job[0] for job in jobs])):
+            result["method"] = method
+            result["lm"] = lm
+            results.append(result)
     
     return results
 
-def plot_accuracy(results: List[Dict[str, Any]], output_path: str):
+def _aggregate(results: List[Dict[str, Any]]) -> Tuple[List[str], Dict[str, np.ndarray], Dict[str, np.ndarray], Dict[str, np.ndarray]]:
     """
-    绘制准确率对比图。
+    一次遍历结果，按方法分组得到准确率、时间和Token开销。
 
     :param results: 结果数据列表
     :type results: List[Dict[str, Any]]
+    :return: (排序后的方法列表, 各方法的准确率, 各方法的处理时间, 各方法的Token数量)
+    :rtype: Tuple[List[str], Dict[str, np.ndarray], Dict[str, np.ndarray], Dict[str, np.ndarray]]
+    """
+    names, correct, total, times, tokens = [], [], [], [], []
+    for r in results:
+        names.append(r["method"])
+        correct.append(len(r["correct_ilfs"]))
+        total.append(r["total_ilfs"])
+        times.append(r["time_cost"])
+        tokens.append(r["token_cost"])
+
+    methods, index = np.unique(np.asarray(names), return_inverse=True)
+    correct = np.asarray(correct, dtype=float)
+    total = np.asarray(total, dtype=float)
+    # 准确率：正确识别的ILF数量 / 实际ILF总数（总数为0时记为0）
+    accuracy = np.divide(correct, total, out=np.zeros_like(correct), where=total > 0)
+    times = np.asarray(times, dtype=float)
+    tokens = np.asarray(tokens, dtype=float)
+
+    methods = methods.tolist()
+    groups = [index == i for i in range(len(methods))]
+    return (
+        methods,
+        {m: accuracy[g] for m, g in zip(methods, groups)},
+        {m: times[g] for m, g in zip(methods, groups)},
+        {m: tokens[g] for m, g in zip(methods, groups)},
+    )
+
+def _boxplot(methods: List[str], values: Dict[str, np.ndarray], title: str, ylabel: str, output_path: str):
+    """
+    绘制按方法分组的箱线图。
+
+    :param methods: 方法列表
+    :type methods: List[str]
+    :param values: 各方法的数据
+    :type values: Dict[str, np.ndarray]
+    :param title: 图表标题
+    :type title: str
+    :param ylabel: 纵轴标签
+    :type ylabel: str
     :param output_path: 输出文件路径
     :type output_path: str
     """
-    methods = sorted(list(set(r["method"] for r in results)))
-    accuracies = {m: [] for m in methods}
-    
-    for r in results:
-        method = r["method"]
-        # 计算准确率：正确识别的ILF数量 / 实际ILF总数
-        accuracy = len(r["correct_ilfs"]) / r["total_ilfs"] if r["total_ilfs"] > 0 else 0
-        accuracies[method].append(accuracy)
-    
     plt.figure(figsize=(10, 6))
-    plt.boxplot([accuracies[m] for m in methods], labels=methods)
-    plt.title("ILF识别准确率对比")
-    plt.ylabel("准确率")
+    plt.boxplot([values[m] for m in methods], labels=methods)
+    plt.title(title)
+    plt.ylabel(ylabel)
     plt.grid(True)
     plt.savefig(output_path)
     plt.close()
 
-def plot_time_cost(results: List[Dict[str, Any]], output_path: str):
+def plot_accuracy(methods: List[str], accuracies: Dict[str, np.ndarray], output_path: str):
+    """
+    绘制准确率对比图。
+
+    :param methods: 方法列表
+    :type methods: List[str]
+    :param accuracies: 各方法的准确率
+    :type accuracies: Dict[str, np.ndarray]
+    :param output_path: 输出文件路径
+    :type output_path: str
+    """
+    _boxplot(methods, accuracies, "ILF识别准确率对比", "准确率", output_path)
+
+def plot_time_cost(methods: List[str], times: Dict[str, np.ndarray], output_path: str):
     """
     绘制时间开销对比图。
 
-    :param results: 结果数据列表
-    :type results: List[Dict[str, Any]]
+    :param methods: 方法列表
+    :type methods: List[str]
+    :param times: 各方法的处理时间
+    :type times: Dict[str, np.ndarray]
     :param output_path: 输出文件路径
     :type output_path: str
     """
-    methods = sorted(list(set(r["method"] for r in results)))
-    times = {m: [] for m in methods}
-    
-    for r in results:
-        method = r["method"]
-        times[method].append(r["time_cost"])
-    
-    plt.figure(figsize=(10, 6))
-    plt.boxplot([times[m] for m in methods], labels=methods)
-    plt.title("处理时间对比")
-    plt.ylabel("时间 (秒)")
-    plt.grid(True)
-    plt.savefig(output_path)
-    plt.close()
+    _boxplot(methods, times, "处理时间对比", "时间 (秒)", output_path)
 
-def plot_token_cost(results: List[Dict[str, Any]], output_path: str):
+def plot_token_cost(methods: List[str], tokens: Dict[str, np.ndarray], output_path: str):
     """
     绘制Token开销对比图。
 
-    :param results: 结果数据列表
-    :type results: List[Dict[str, Any]]
+    :param methods: 方法列表
+    :type methods: List[str]
+    :param tokens: 各方法的Token数量
+    :type tokens: Dict[str, np.ndarray]
     :param output_path: 输出文件路径
     :type output_path: str
     """
-    methods = sorted(list(set(r["method"] for r in results)))
-    tokens = {m: [] for m in methods}
-    
-    for r in results:
-        method = r["method"]
-        tokens[method].append(r["token_cost"])
-    
-    plt.figure(figsize=(10, 6))
-    plt.boxplot([tokens[m] for m in methods], labels=methods)
-    plt.title("Token使用量对比")
-    plt.ylabel("Token数量")
-    plt.grid(True)
-    plt.savefig(output_path)
-    plt.close()
+    _boxplot(methods, tokens, "Token使用量对比", "Token数量", output_path)
 
 def main():
     # 设置中文字体
@@ -135,10 +189,11 @@ def main():
     if not os.path.exists(plots_dir):
         os.makedirs(plots_dir)
     
-    # 绘制图表
-    plot_accuracy(results, os.path.join(plots_dir, "accuracy.png"))
-    plot_time_cost(results, os.path.join(plots_dir, "time_cost.png"))
-    plot_token_cost(results, os.path.join(plots_dir, "token_cost.png"))
+    # 绘制图表（结果只汇总一次）
+    methods, accuracies, times, tokens = _aggregate(results)
+    plot_accuracy(methods, accuracies, os.path.join(plots_dir, "accuracy.png"))
+    plot_time_cost(methods, times, os.path.join(plots_dir, "time_cost.png"))
+    plot_token_cost(methods, tokens, os.path.join(plots_dir, "token_cost.png"))
     
     print("图表生成完成，保存在:", plots_dir)
 
@@ -4,26 +4,40 @@
 import os
 import csv
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-def extract_doc_info(filename: str) -> Tuple[int, str]:
+# 样本文件名：文档ID + 文档名称 + 文件类型（1为需求文档，2为分析结果）+ .txt
+_RE_DOC_FILE = re.compile(r'(\d+)(.*?)([12])\.txt$')
+
+# 分析结果中的ILF总数和表格行，只在模块加载时编译一次。
+# 名称列的首尾必须是非空白字符，两侧的空白只能由 \s* 匹配，
+# 否则一长串空白可以在 \s* 和名称之间任意划分，匹配失败时回溯次数随长度的立方增长。
+# 只含空白的名称列单独匹配为空名称（紧跟在空白之后的 |），与原来一样占用这一行，
+# 后面的单元格不会被当成另一行
+_RE_TOTAL_ILFS = re.compile(r'结论:\s*(\d+)个ILF功能点')
+_RE_TABLE_ROW = re.compile(
+    r'\|\s*([\w\u4e00-\u9fff](?:[\w\s\u4e00-\u9fff]*[\w\u4e00-\u9fff])?|(?<=\s)(?=\|))'
+    r'\s*\|\s*(是|否)\s*\|\s*(.+?)\s*\|'
+)
+
+def extract_doc_info(filename: str) -> Optional[Tuple[int, str, str]]:
     """
-    从文件名中提取文档ID和名称。
+    从文件名中提取文档ID、名称和文件类型。
     
     :param filename: 文件名
     :type filename: str
-    :return: (文档ID, 文档名称)
-    :rtype: Tuple[int, str]
+    :return: (文档ID, 文档名称, 文件类型："1"为需求文档，"2"为分析结果)；文件名不符合格式时返回None
+    :rtype: Optional[Tuple[int, str, str]]
     """
     # 提取文档ID和名称
-    match = re.match(r'(\d+)(.*?)(?:1|2)\.txt$', filename)
+    match = _RE_DOC_FILE.match(filename)
     if not match:
-        raise ValueError(f"无法从文件名 '{filename}' 中提取ID和名称")
+        return None
     
     doc_id = int(match.group(1))
     doc_name = match.group(2).strip()
     
-    return doc_id, doc_name
+    return doc_id, doc_name, match.group(3)
 
 def parse_analysis_result(content: str) -> Tuple[int, List[str], List[str]]:
     """
@@ -35,7 +49,7 @@ def parse_analysis_result(content: str) -> Tuple[int, List[str], List[str]]:
     :rtype: Tuple[int, List[str], List[str]]
     """
     # 提取ILF总数
-    total_match = re.search(r'结论:\s*(\d+)个ILF功能点', content)
+    total_match = _RE_TOTAL_ILFS.search(content)
     total_ilfs = int(total_match.group(1)) if total_match else 0
     
     # 提取ILF名称和理由
@@ -43,10 +57,7 @@ def parse_analysis_result(content: str) -> Tuple[int, List[str], List[str]]:
     ilf_reasons = []
     
     # 使用正则表达式匹配表格内容
-    table_pattern = r'\|\s*([\w\s\u4e00-\u9fff]+)\s*\|\s*(是|否)\s*\|\s*(.+?)\s*\|'
-    matches = re.finditer(table_pattern, content)
-    
-    for match in matches:
+    for match in _RE_TABLE_ROW.finditer(content):
         name, is_ilf, reason = match.groups()
         if is_ilf == "是":
             ilf_names.append(name.strip())
@@ -63,56 +74,63 @@ def process_samples(samples_dir: str, output_file: str):
     :param output_file: 输出CSV文件路径
     :type output_file: str
     """
-    # 准备数据结构
-    samples = {}  # {doc_id: {field: value}}
+    # 先按文档ID给文件分组，再按ID顺序逐个文档读取并写出，
+    # 内存中只保留当前文档的内容
+    files = {}  # {doc_id: {"1"/"2": (doc_name, filepath)}}
+    with os.scandir(samples_dir) as it:
+        for entry in it:
+            filename = entry.name
+            if not filename.endswith(("1.txt", "2.txt")):
+                continue
+            info = extract_doc_info(filename)
+            if info is None:
+                print(f"处理文件 '{filename}' 时出错: 无法从文件名 '{filename}' 中提取ID和名称")
+                continue
+            doc_id, doc_name, kind = info
+            files.setdefault(doc_id, {})[kind] = (doc_name, entry.path)
+    
+    # 写入CSV文件
+    fieldnames = ["doc_id", "doc_name", "requirement_text", "analysis_result", 
+                 "total_ilfs", "ilf_names", "ilf_reasons"]
     
-    # 读取所有文件
-    for filename in os.listdir(samples_dir):
-        filepath = os.path.join(samples_dir, filename)
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
         
-        try:
-            if filename.endswith("1.txt"):  # 需求文档
-                doc_id, doc_name = extract_doc_info(filename)
-                with open(filepath, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    
-                    if doc_id not in samples:
-                        samples[doc_id] = {}
-                    samples[doc_id].update({
+        # 按文档ID排序写入
+        for doc_id in sorted(files):
+            sample = {}
+            
+            if "1" in files[doc_id]:  # 需求文档
+                doc_name, filepath = files[doc_id]["1"]
+                try:
+                    with open(filepath, "r", encoding="utf-8") as doc:
+                        content = doc.read()
+                    sample.update({
                         "doc_id": doc_id,
                         "doc_name": doc_name,
                         "requirement_text": content
                     })
+                except Exception as e:
+                    print(f"处理文件 '{os.path.basename(filepath)}' 时出错: {str(e)}")
             
-            elif filename.endswith("2.txt"):  # 分析结果
-                doc_id, _ = extract_doc_info(filename)
-                with open(filepath, "r", encoding="utf-8") as f:
-                    content = f.read()
+            if "2" in files[doc_id]:  # 分析结果
+                _, filepath = files[doc_id]["2"]
+                try:
+                    with open(filepath, "r", encoding="utf-8") as doc:
+                        content = doc.read()
                     total_ilfs, ilf_names, ilf_reasons = parse_analysis_result(content)
-                    
-                    if doc_id not in samples:
-                        samples[doc_id] = {}
-                    samples[doc_id].update({
+                    sample.update({
                         "analysis_result": content,
                         "total_ilfs": total_ilfs,
                         "ilf_names": "|".join(ilf_names),
                         "ilf_reasons": "|".join(ilf_reasons)
                     })
-        except Exception as e:
-            print(f"处理文件 '{filename}' 时出错: {str(e)}")
-            continue
-    
-    # 写入CSV文件
-    fieldnames = ["doc_id", "doc_name", "requirement_text", "analysis_result", 
-                 "total_ilfs", "ilf_names", "ilf_reasons"]
-    
-    with open(output_file, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        # 按文档ID排序写入
-        for doc_id in sorted(samples.keys()):
-            writer.writerow(samples[doc_id])
+                except Exception as e:
+                    print(f"处理文件 '{os.path.basename(filepath)}' 时出错: {str(e)}")
+            
+            if sample:
+                writer.writerow(sample)
 
 def main():
     # 设置路径
@@ -0,0 +1,25 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from process_samples import parse_analysis_result
+
+
+def test_parse_analysis_result():
+    content = (
+        "| 名称 | 是否ILF | 理由 |\n"
+        "| 用户信息 | 是 | 系统内部维护 |\n"
+        "| 日志 | 否 | 外部系统维护 |\n"
+        "结论: 1个ILF功能点\n"
+    )
+    assert parse_analysis_result(content) == (1, ["用户信息"], ["系统内部维护"])
+
+
+def test_blank_name_row_is_consumed():
+    # 空白名称列本身是一行，后面的单元格不能再组成另一行
+    assert parse_analysis_result('|  \t|\t   是| 否 |\t\n--a|') == (0, [""], ["否"])
+
+
+def test_long_blank_cell_is_linear():
+    assert parse_analysis_result("|" + " " * 100000) == (0, [], [])
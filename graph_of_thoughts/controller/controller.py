@@ -6,15 +6,43 @@
 #
 # main author: Nils Blach
 
+import contextvars
 import json
 import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from graph_of_thoughts.language_models import AbstractLanguageModel
 from graph_of_thoughts.operations import GraphOfOperations, Thought
 from graph_of_thoughts.prompter import Prompter
 from graph_of_thoughts.parser import Parser
 
 
+def _has_non_finite(value: object) -> bool:
+    """
+    Check whether a JSON-serializable value contains a NaN or infinite float.
+
+    :param value: The value to check.
+    :type value: object
+    :return: True if a non-finite float is found, False otherwise.
+    :rtype: bool
+    """
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite(item) for item in value)
+    return False
+
+
 class Controller:
     """
     Controller class to manage the execution flow of the Graph of Operations,
@@ -29,6 +57,7 @@ class Controller:
         prompter: Prompter,
         parser: Parser,
         problem_parameters: dict,
+        max_workers: int = 1,
     ) -> None:
         """
         Initialize the Controller instance with the language model,
@@ -44,6 +73,9 @@ class Controller:
         :type parser: Parser
         :param problem_parameters: Initial parameters/state of the problem.
         :type problem_parameters: dict
+        :param max_workers: Maximum number of independent operations executed at the same
+                            time. Defaults to 1, which executes the operations one by one.
+        :type max_workers: int
         """
         self.logger = logging.getLogger(self.__class__.__module__)
         self.lm = lm
@@ -51,6 +83,7 @@ class Controller:
         self.prompter = prompter
         self.parser = parser
         self.problem_parameters = problem_parameters
+        self.max_workers = max_workers
         self.run_executed = False
 
     def run(self) -> None:
@@ -71,22 +104,64 @@ class Controller:
             if operation.can_be_executed()
         ]
 
-        while len(execution_queue) > 0:
-            current_operation = execution_queue.pop(0)
-            self.logger.info("Executing operation %s", current_operation.operation_type)
-            current_operation.execute(
-                self.lm, self.prompter, self.parser, **self.problem_parameters
-            )
-            self.logger.info("Operation %s executed", current_operation.operation_type)
-            for operation in current_operation.successors:
-                assert (
-                    operation in self.graph.operations
-                ), "The successor of an operation is not in the operations graph"
-                if operation.can_be_executed():
-                    execution_queue.append(operation)
+        if self.max_workers > 1:
+            self._run_concurrently(execution_queue)
+        else:
+            while len(execution_queue) > 0:
+                current_operation = execution_queue.pop(0)
+                self._execute(current_operation)
+                for operation in current_operation.successors:
+                    assert (
+                        operation in self.graph.operations
+                    ), "The successor of an operation is not in the operations graph"
+                    if operation.can_be_executed():
+                        execution_queue.append(operation)
         self.logger.info("All operations executed")
         self.run_executed = True
 
+    def _execute(self, operation) -> None:
+        """
+        Execute a single operation of the Graph of Operations.
+
+        :param operation: The operation to execute.
+        :type operation: Operation
+        """
+        self.logger.info("Executing operation %s", operation.operation_type)
+        operation.execute(self.lm, self.prompter, self.parser, **self.problem_parameters)
+        self.logger.info("Operation %s executed", operation.operation_type)
+
+    def _run_concurrently(self, execution_queue: List) -> None:
+        """
+        Execute the operations in waves: all operations that are ready are
+        executed at the same time on a thread pool, then their successors that
+        became ready form the next wave. Independent branches of the graph,
+        such as parallel Generate chains, thereby overlap their language model
+        requests. Each operation runs in a copy of the caller's context, so
+        context variables set by the caller are visible to scoring functions.
+
+        :param execution_queue: The operations that are ready to be executed.
+        :type execution_queue: List[Operation]
+        """
+        queued = set(execution_queue)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while len(execution_queue) > 0:
+                wave, execution_queue = execution_queue, []
+                futures = [
+                    pool.submit(contextvars.copy_context().run, self._execute, operation)
+                    for operation in wave
+                ]
+                for future in futures:
+                    future.result()
+                for current_operation in wave:
+                    for operation in current_operation.successors:
+                        assert (
+                            operation in self.graph.operations
+                        ), "The successor of an operation is not in the operations graph"
+                        # A successor of several operations of the same wave is queued once.
+                        if operation not in queued and operation.can_be_executed():
+                            queued.add(operation)
+                            execution_queue.append(operation)
+
     def get_final_thoughts(self) -> List[List[Thought]]:
         """
         Retrieve the final thoughts after all operations have been executed.
@@ -148,5 +223,23 @@ class Controller:
             }
         )
 
-        with open(path, "w", encoding="utf-8") as file:
+        # Write to a temporary file and move it into place, so that readers of
+        # the results never see a partially written file.
+        tmp_path = f"{path}.tmp"
+        # orjson is faster than json.dump below, but it writes NaN and Infinity
+        # as null; scores and states holding such floats use the standard
+        # encoder, which keeps them as NaN/Infinity for json.load.
+        if orjson is not None and not _has_non_finite(output):
+            try:
+                data = orjson.dumps(output, option=orjson.OPT_INDENT_2)
+            except TypeError:
+                # States holding values orjson cannot encode use the standard encoder.
+                data = None
+            if data is not None:
+                with open(tmp_path, "wb") as file:
+                    file.write(data)
+                os.replace(tmp_path, path)
+                return
+        with open(tmp_path, "w", encoding="utf-8") as file:
             json.dump(output, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
@@ -7,10 +7,11 @@
 # main author: Nils Blach
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Union, Any
+from typing import List, Dict, Tuple, Union, Any
 import json
 import os
 import logging
+import threading
 
 
 class AbstractLanguageModel(ABC):
@@ -18,6 +19,11 @@ class AbstractLanguageModel(ABC):
     Abstract base class that defines the interface for all language models.
     """
 
+    # Parsed config files shared by all instances, keyed by absolute path.
+    # Each entry holds the file's mtime so that edits are picked up.
+    _config_cache: Dict[str, Tuple[int, Dict]] = {}
+    _config_lock = threading.Lock()
+
     def __init__(
         self, config_path: str = "", model_name: str = "", cache: bool = False
     ) -> None:
@@ -46,6 +52,9 @@ class AbstractLanguageModel(ABC):
         """
         Load configuration from a specified path.
 
+        The parsed file is shared between instances and only re-read when its
+        modification time changes, so it must be treated as read-only.
+
         :param path: Path to the config file. If an empty path provided,
                      default is `config.json` in the current directory.
         :type path: str
@@ -54,8 +63,15 @@ class AbstractLanguageModel(ABC):
             current_dir = os.path.dirname(os.path.abspath(__file__))
             path = os.path.join(current_dir, "config.json")
 
-        with open(path, "r") as f:
-            self.config = json.load(f)
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        with AbstractLanguageModel._config_lock:
+            cached = AbstractLanguageModel._config_cache.get(path)
+            if cached is None or cached[0] != mtime:
+                with open(path, "r") as f:
+                    cached = (mtime, json.load(f))
+                AbstractLanguageModel._config_cache[path] = cached
+        self.config = cached[1]
 
         self.logger.debug(f"Loaded config from {path} for {self.model_name}")
 
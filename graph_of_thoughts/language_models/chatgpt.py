@@ -7,15 +7,27 @@
 # main author: Nils Blach
 
 import backoff
+import hashlib
+import httpx
+import json
 import os
 import random
+import sqlite3
+import threading
 import time
-from typing import List, Dict, Union
+from typing import List, Dict, Tuple, Union
 from openai import OpenAI, OpenAIError
 from openai.types.chat.chat_completion import ChatCompletion
 
 from .abstract_language_model import AbstractLanguageModel
 
+try:
+    import h2  # noqa: F401 (required by httpx for HTTP/2)
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 
 class ChatGPT(AbstractLanguageModel):
     """
@@ -24,6 +36,20 @@ class ChatGPT(AbstractLanguageModel):
     Inherits from the AbstractLanguageModel and implements its abstract methods.
     """
 
+    # OpenAI clients shared by all instances with the same connection settings,
+    # so that their HTTP connection pool (and keep-alive connections) is reused.
+    _clients: Dict[Tuple, OpenAI] = {}
+    _clients_lock = threading.Lock()
+
+    # Whether an endpoint/model returns n choices for a request with n > 1, learned from
+    # the first multi-sample response. Some OpenAI compatible APIs (e.g. DeepSeek)
+    # silently ignore n and return a single choice.
+    _supports_n: Dict[Tuple[str, str], bool] = {}
+
+    # Persistent response caches (SQLite databases) shared by all instances, keyed by absolute path.
+    _cache_dbs: Dict[str, sqlite3.Connection] = {}
+    _cache_db_lock = threading.Lock()
+
     def __init__(
         self, config_path: str = "", model_name: str = "chatgpt", cache: bool = False
     ) -> None:
@@ -59,13 +85,143 @@ class ChatGPT(AbstractLanguageModel):
             raise ValueError("OPENAI_API_KEY is not set")
         # Get base_url from config or use default None
         self.base_url: str = self.config.get("base_url", "")
+        # Endpoint, model id and sampling settings that determine the responses; queries that
+        # share a model name but differ in any of them must not be treated as the same.
+        self.settings: str = f"{self.base_url}\0{self.model_id}\0{self.temperature}\0{self.max_tokens}\0{self.stop!r}"
         # Initialize the OpenAI Client
         client_kwargs = {"api_key": self.api_key}
         if self.organization:
             client_kwargs["organization"] = self.organization
         if self.base_url:
             client_kwargs["base_url"] = self.base_url
-        self.client = OpenAI(**client_kwargs)
+        self.client = self._get_client(client_kwargs)
+        # Guards the usage counters when one instance is queried from several threads.
+        self._usage_lock = threading.Lock()
+        # Optional config flag to skip detecting whether the API honours n > 1.
+        supports_n = self.config.get("supports_n")
+        if supports_n is not None:
+            self._supports_n[(self.base_url, self.model_id)] = supports_n
+        # Optional path of a SQLite database that keeps cached responses across runs.
+        self.cache_db: Union[sqlite3.Connection, None] = None
+        if self.cache and self.config.get("cache_db"):
+            self.cache_db = self._get_cache_db(self.config["cache_db"])
+
+    @classmethod
+    def _get_client(cls, client_kwargs: Dict) -> OpenAI:
+        """
+        Return the shared OpenAI client for the given settings, creating it on first use.
+
+        :param client_kwargs: Keyword arguments for the OpenAI client.
+        :type client_kwargs: Dict
+        :return: The OpenAI client.
+        :rtype: OpenAI
+        """
+        key = tuple(sorted(client_kwargs.items()))
+        with cls._clients_lock:
+            client = cls._clients.get(key)
+            if client is None:
+                if HTTP2_AVAILABLE:
+                    # Multiplex concurrent requests over a single HTTP/2 connection per host.
+                    # Timeouts and redirects follow the OpenAI client's defaults.
+                    client_kwargs = {
+                        **client_kwargs,
+                        "http_client": httpx.Client(
+                            http2=True,
+                            timeout=httpx.Timeout(600.0, connect=5.0),
+                            limits=httpx.Limits(
+                                max_connections=64, max_keepalive_connections=32
+                            ),
+                            follow_redirects=True,
+                        ),
+                    }
+                client = OpenAI(**client_kwargs)
+                cls._clients[key] = client
+        return client
+
+    @classmethod
+    def _get_cache_db(cls, path: str) -> sqlite3.Connection:
+        """
+        Return the shared connection to the persistent response cache, creating the database on first use.
+
+        :param path: Path to the SQLite database file.
+        :type path: str
+        :return: The database connection.
+        :rtype: sqlite3.Connection
+        """
+        path = os.path.abspath(path)
+        with cls._cache_db_lock:
+            db = cls._cache_dbs.get(path)
+            if db is None:
+                db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses (key BLOB PRIMARY KEY, value TEXT NOT NULL)"
+                )
+                cls._cache_dbs[path] = db
+        return db
+
+    def _cache_key(self, query: str, num_responses: int) -> bytes:
+        """
+        Compute the key of a query in the persistent response cache.
+
+        :param query: The query posed to the language model.
+        :type query: str
+        :param num_responses: Number of desired responses.
+        :type num_responses: int
+        :return: 16 byte digest of the endpoint, model id, sampling settings, number of responses and query.
+        :rtype: bytes
+        """
+        return hashlib.blake2b(
+            f"{self.settings}\0{num_responses}\0{query}".encode("utf-8"), digest_size=16
+        ).digest()
+
+    def _load_cached(
+        self, key: bytes
+    ) -> Union[List[ChatCompletion], ChatCompletion, None]:
+        """
+        Look up a response in the persistent response cache.
+
+        :param key: Key computed by _cache_key.
+        :type key: bytes
+        :return: The cached response(s), or None if the query has not been cached.
+        :rtype: Union[List[ChatCompletion], ChatCompletion, None]
+        """
+        with self._cache_db_lock:
+            row = self.cache_db.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        responses = [ChatCompletion.model_validate(r) for r in value["responses"]]
+        return responses if value["is_list"] else responses[0]
+
+    def _store_cached(
+        self, key: bytes, response: Union[List[ChatCompletion], ChatCompletion]
+    ) -> None:
+        """
+        Store a response in the persistent response cache.
+
+        :param key: Key computed by _cache_key.
+        :type key: bytes
+        :param response: Response(s) from the OpenAI model.
+        :type response: Union[List[ChatCompletion], ChatCompletion]
+        """
+        is_list = isinstance(response, list)
+        responses = response if is_list else [response]
+        value = json.dumps(
+            {
+                "is_list": is_list,
+                "responses": [r.model_dump(mode="json") for r in responses],
+            },
+            ensure_ascii=False,
+        )
+        with self._cache_db_lock:
+            self.cache_db.execute(
+                "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)",
+                (key, value),
+            )
 
     def query(
         self, query: str, num_responses: int = 1
@@ -83,18 +239,37 @@ class ChatGPT(AbstractLanguageModel):
         if self.cache and query in self.response_cache:
             return self.response_cache[query]
 
+        if self.cache_db is not None:
+            key = self._cache_key(query, num_responses)
+            response = self._load_cached(key)
+            if response is not None:
+                self.response_cache[query] = response
+                return response
+
         if num_responses == 1:
             response = self.chat([{"role": "user", "content": query}], num_responses)
         else:
             response = []
             next_try = num_responses
             total_num_attempts = num_responses
+            endpoint = (self.base_url, self.model_id)
             while num_responses > 0 and total_num_attempts > 0:
                 try:
                     assert next_try > 0
+                    if not self._supports_n.get(endpoint, True):
+                        next_try = 1
                     res = self.chat([{"role": "user", "content": query}], next_try)
                     response.append(res)
-                    num_responses -= next_try
+                    received = len(res.choices)
+                    if next_try > 1 and endpoint not in self._supports_n:
+                        self._supports_n[endpoint] = received == next_try
+                        if received < next_try:
+                            self.logger.info(
+                                f"{self.model_id} ignores n, falling back to one sample per request"
+                            )
+                    if received == 0:
+                        total_num_attempts -= 1
+                    num_responses -= received
                     next_try = min(num_responses, next_try)
                 except Exception as e:
                     next_try = (next_try + 1) // 2
@@ -106,6 +281,8 @@ class ChatGPT(AbstractLanguageModel):
 
         if self.cache:
             self.response_cache[query] = response
+        if self.cache_db is not None and response:
+            self._store_cached(key, response)
         return response
 
     @backoff.on_exception(backoff.expo, OpenAIError, max_time=10, max_tries=6)
@@ -130,14 +307,15 @@ class ChatGPT(AbstractLanguageModel):
             stop=self.stop,
         )
 
-        self.prompt_tokens += response.usage.prompt_tokens
-        self.completion_tokens += response.usage.completion_tokens
-        prompt_tokens_k = float(self.prompt_tokens) / 1000.0
-        completion_tokens_k = float(self.completion_tokens) / 1000.0
-        self.cost = (
-            self.prompt_token_cost * prompt_tokens_k
-            + self.response_token_cost * completion_tokens_k
-        )
+        with self._usage_lock:
+            self.prompt_tokens += response.usage.prompt_tokens
+            self.completion_tokens += response.usage.completion_tokens
+            prompt_tokens_k = float(self.prompt_tokens) / 1000.0
+            completion_tokens_k = float(self.completion_tokens) / 1000.0
+            self.cost = (
+                self.prompt_token_cost * prompt_tokens_k
+                + self.response_token_cost * completion_tokens_k
+            )
         self.logger.info(
             f"This is the response from chatgpt: {response}"
             f"\nThis is the cost of the response: {self.cost}"